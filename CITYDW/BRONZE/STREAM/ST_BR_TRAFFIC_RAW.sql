@@ -0,0 +1,4 @@
+create or replace stream ST_BR_TRAFFIC_RAW
+  on table BR_TRAFFIC_RAW
+  append_only = true
+  show_initial_rows = true;
@@ -0,0 +1,3 @@
+create or replace stage SERVICE_REQUEST_QUEUE_STAGE
+	encryption = (type = 'SNOWFLAKE_SSE')
+	comment = 'Priority-queue app snapshot (queue_store.parquet) with its change watermark';
@@ -0,0 +1,3 @@
+create or replace stream ST_POTHOLE_PREDICTIONS
+  on table POTHOLE_PREDICTIONS
+  show_initial_rows = true;
@@ -0,0 +1,9 @@
+create or replace TABLE POTHOLE_METRICS_DAILY_BORO (
+	ASOF_DATE DATE,
+	BOROUGH VARCHAR(16777216),
+	TP NUMBER(18,0),
+	FP NUMBER(18,0),
+	FN NUMBER(18,0),
+	TN NUMBER(18,0),
+	N NUMBER(18,0)
+);
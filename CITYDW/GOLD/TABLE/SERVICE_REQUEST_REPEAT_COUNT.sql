@@ -0,0 +1,7 @@
+create or replace TABLE SERVICE_REQUEST_REPEAT_COUNT (
+	AGENCY_NAME VARCHAR(16777216),
+	COMPLAINT_TYPE VARCHAR(16777216),
+	DESCRIPTOR VARCHAR(16777216),
+	H3_CELL NUMBER(18,0),
+	RECENT_SIMILAR_COUNT NUMBER(18,0)
+);
@@ -0,0 +1,8 @@
+create or replace TABLE SERVICE_REQUEST_REPEAT_DAILY (
+	AGENCY_NAME VARCHAR(16777216),
+	COMPLAINT_TYPE VARCHAR(16777216),
+	DESCRIPTOR VARCHAR(16777216),
+	H3_CELL NUMBER(18,0),
+	CREATED_DAY DATE,
+	N NUMBER(18,0)
+);
@@ -0,0 +1,4 @@
+create or replace TABLE SERVICE_REQUEST_SLA_SEEN (
+	UNIQUE_KEY NUMBER(38,0),
+	CLOSED_TS TIMESTAMP_NTZ(9)
+);
@@ -0,0 +1,9 @@
+create or replace TABLE SERVICE_REQUEST_SLA_SKETCH (
+	SLA_LEVEL NUMBER(1,0),
+	AGENCY_NAME VARCHAR(16777216),
+	COMPLAINT_TYPE VARCHAR(16777216),
+	DESCRIPTOR VARCHAR(16777216),
+	BOROUGH VARCHAR(16777216),
+	CLOSE_HOURS_STATE VARIANT,
+	N NUMBER(18,0)
+);
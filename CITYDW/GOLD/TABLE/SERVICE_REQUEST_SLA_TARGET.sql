@@ -0,0 +1,11 @@
+create or replace TABLE SERVICE_REQUEST_SLA_TARGET (
+	AGENCY_NAME VARCHAR(16777216),
+	COMPLAINT_TYPE VARCHAR(16777216),
+	DESCRIPTOR VARCHAR(16777216),
+	BOROUGH VARCHAR(16777216),
+	SLA_LEVEL NUMBER(1,0),
+	P50_CLOSE_HOURS NUMBER(12,3),
+	P80_CLOSE_HOURS NUMBER(12,3),
+	P95_CLOSE_HOURS NUMBER(12,3),
+	N NUMBER(18,0)
+);
@@ -0,0 +1,11 @@
+create or replace TABLE TRAFFIC_CELL_ANOMALY (
+	H3_CELL NUMBER(18,0),
+	DTE TIMESTAMP_NTZ(9),
+	WEEKDAY NUMBER(1,0),
+	VOLUME_VEH_DAY NUMBER(38,0),
+	BASELINE_N NUMBER(18,0),
+	BASELINE_MEAN FLOAT,
+	BASELINE_STD FLOAT,
+	Z_SCORE FLOAT,
+	SCORED_AT TIMESTAMP_NTZ(9)
+);
@@ -0,0 +1,8 @@
+create or replace TABLE TRAFFIC_CELL_WEEKDAY_STATS (
+	H3_CELL NUMBER(18,0),
+	WEEKDAY NUMBER(1,0),
+	N NUMBER(18,0),
+	MEAN FLOAT,
+	M2 FLOAT,
+	LAST_DTE TIMESTAMP_NTZ(9)
+);
@@ -0,0 +1,10 @@
+create or replace TABLE TRAFFIC_CUBE_DAILY (
+	DTE DATE,
+	TRAFFIC_YEAR NUMBER(4,0),
+	TRAFFIC_MONTH NUMBER(2,0),
+	H3_CELL NUMBER(18,0),
+	BOROUGH VARCHAR(16777216),
+	DIRECTION VARCHAR(16777216),
+	VOLUME_VEH NUMBER(38,0),
+	N_OBS NUMBER(38,0)
+);
@@ -0,0 +1,6 @@
+create or replace TABLE TRAFFIC_CUBE_YEAR_CELL (
+	TRAFFIC_YEAR NUMBER(4,0),
+	H3_CELL NUMBER(18,0),
+	VOLUME_VEH NUMBER(38,0),
+	N_OBS NUMBER(38,0)
+);
@@ -0,0 +1,36 @@
+create or replace task TK_REFRESH_POTHOLE_METRICS
+  warehouse = COMPUTE_WH
+  schedule = '15 MINUTE'
+  when system$stream_has_data('CITYDW.GOLD.ST_POTHOLE_PREDICTIONS')
+as
+begin
+  /* ASOF_DAY partitions touched since the last run (all of them on the first run) */
+  create or replace temporary table TMP_METRICS_DAYS as
+    select distinct asof_day::date as asof_date
+    from CITYDW.GOLD.ST_POTHOLE_PREDICTIONS;
+
+  delete from CITYDW.GOLD.POTHOLE_METRICS_DAILY_BORO m
+  using TMP_METRICS_DAYS d
+  where m.asof_date = d.asof_date;
+
+  insert into CITYDW.GOLD.POTHOLE_METRICS_DAILY_BORO (asof_date, borough, tp, fp, fn, tn, n)
+  select
+    p.asof_day::date as asof_date,
+    b.borough,
+    sum(iff(p.predicted_label=1 and p.actual_label=1,1,0)) as tp,
+    sum(iff(p.predicted_label=1 and p.actual_label=0,1,0)) as fp,
+    sum(iff(p.predicted_label=0 and p.actual_label=1,1,0)) as fn,
+    sum(iff(p.predicted_label=0 and p.actual_label=0,1,0)) as tn,
+    count(*) as n
+  from CITYDW.GOLD.POTHOLE_PREDICTIONS p
+  join TMP_METRICS_DAYS d
+    on d.asof_date = p.asof_day::date
+  left join CITYDW.SILVER.SV_H3_BOROUGH b
+    on b.h3_cell = p.h3_cell
+  group by 1, 2;
+end;
+
+/* tasks are created suspended; the first run reads the stream's initial rows,
+   i.e. every prediction day, so running it once now backfills the rollup */
+alter task TK_REFRESH_POTHOLE_METRICS resume;
+execute task TK_REFRESH_POTHOLE_METRICS;
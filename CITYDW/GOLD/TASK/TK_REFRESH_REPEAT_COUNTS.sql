@@ -0,0 +1,66 @@
+create or replace task TK_REFRESH_REPEAT_COUNTS
+  warehouse = COMPUTE_WH
+  schedule = '15 MINUTE'
+as
+begin
+  /* recount the last few bucket days, not just the newest one, so requests that
+     land late with an earlier created_ts are still counted (the whole window on
+     the first run) */
+  let lag_days number := 3;
+  let window_start date := dateadd('day', -32, current_date());
+  let from_day date := (
+    select greatest(coalesce(dateadd('day', -:lag_days, max(created_day)), :window_start), :window_start)
+    from CITYDW.GOLD.SERVICE_REQUEST_REPEAT_DAILY
+  );
+
+  /* keys whose window total can change this run: recounted or expiring buckets */
+  create or replace temporary table TMP_REPEAT_KEYS as
+    select distinct agency_name, complaint_type, descriptor, H3_CELL
+    from CITYDW.GOLD.SERVICE_REQUEST_REPEAT_DAILY
+    where created_day >= :from_day
+       or created_day < :window_start;
+
+  delete from CITYDW.GOLD.SERVICE_REQUEST_REPEAT_DAILY
+  where created_day >= :from_day
+     or created_day < :window_start;
+
+  insert into CITYDW.GOLD.SERVICE_REQUEST_REPEAT_DAILY
+    (agency_name, complaint_type, descriptor, h3_cell, created_day, n)
+  select agency_name, complaint_type, descriptor, H3_CELL, created_ts::date, count(*)
+  from CITYDW.SILVER.V_SERVICE_REQUEST_INFRA
+  where created_ts >= :from_day
+  group by 1, 2, 3, 4, 5;
+
+  insert into TMP_REPEAT_KEYS
+  select distinct agency_name, complaint_type, descriptor, H3_CELL
+  from CITYDW.GOLD.SERVICE_REQUEST_REPEAT_DAILY
+  where created_day >= :from_day;
+
+  /* window totals for those keys only; keys left with nothing are removed */
+  merge into CITYDW.GOLD.SERVICE_REQUEST_REPEAT_COUNT c
+  using (
+    select k.agency_name, k.complaint_type, k.descriptor, k.H3_CELL,
+           coalesce(sum(d.n), 0) as recent_similar_count
+    from (select distinct * from TMP_REPEAT_KEYS) k
+    left join CITYDW.GOLD.SERVICE_REQUEST_REPEAT_DAILY d
+      on equal_null(d.agency_name, k.agency_name)
+     and equal_null(d.complaint_type, k.complaint_type)
+     and equal_null(d.descriptor, k.descriptor)
+     and equal_null(d.H3_CELL, k.H3_CELL)
+    group by 1, 2, 3, 4
+  ) t
+  on equal_null(c.agency_name, t.agency_name)
+ and equal_null(c.complaint_type, t.complaint_type)
+ and equal_null(c.descriptor, t.descriptor)
+ and equal_null(c.H3_CELL, t.H3_CELL)
+  when matched and t.recent_similar_count = 0 then delete
+  when matched then update set recent_similar_count = t.recent_similar_count
+  when not matched and t.recent_similar_count > 0 then insert
+    (agency_name, complaint_type, descriptor, H3_CELL, recent_similar_count)
+    values (t.agency_name, t.complaint_type, t.descriptor, t.H3_CELL, t.recent_similar_count);
+end;
+
+/* tasks are created suspended; the first run counts the whole 32-day window,
+   so run it once now to fill the counts the repeats view reads */
+alter task TK_REFRESH_REPEAT_COUNTS resume;
+execute task TK_REFRESH_REPEAT_COUNTS;
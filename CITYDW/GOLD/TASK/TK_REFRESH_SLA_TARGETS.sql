@@ -0,0 +1,100 @@
+create or replace task TK_REFRESH_SLA_TARGETS
+  warehouse = COMPUTE_WH
+  schedule = 'USING CRON 30 4 * * * UTC'
+as
+begin
+  /* a finer level only stands in for its parent once it has this many closures */
+  let min_n number := 20;
+
+  /* requests closed since the last run, by load rather than by closed_ts, so
+     late-arriving closures are not skipped; each request is counted once, at
+     its first closure, even if it is reopened and closed again. The insert
+     consumes the stream (every row on the first run). */
+  create or replace temporary table TMP_SLA_CLOSED (
+    unique_key number(38,0), closed_ts timestamp_ntz,
+    agency_name varchar, complaint_type varchar, descriptor varchar, borough varchar,
+    close_hours number(18,6)
+  );
+  insert into TMP_SLA_CLOSED
+  select c.unique_key, c.closed_ts,
+         coalesce(c.agency_name, ''), coalesce(c.complaint_type, ''),
+         coalesce(c.descriptor, ''), coalesce(c.borough, ''),
+         datediff('minute', c.created_ts, c.closed_ts) / 60.0
+  from CITYDW.SILVER.ST_SV_SERVICE_REQUEST c
+  where c.metadata$action = 'INSERT'
+    and c.closed_ts is not null
+    and c.closed_ts >= c.created_ts
+    and not exists (
+      select 1 from CITYDW.GOLD.SERVICE_REQUEST_SLA_SEEN x where x.unique_key = c.unique_key
+    )
+  qualify row_number() over (partition by c.unique_key order by c.closed_ts) = 1;
+
+  insert into CITYDW.GOLD.SERVICE_REQUEST_SLA_SEEN (unique_key, closed_ts)
+  select unique_key, closed_ts from TMP_SLA_CLOSED;
+
+  /* one t-digest per hierarchy level and key:
+     1 = agency/type/descriptor/borough, 2 = agency/type/descriptor, 3 = agency/type, 4 = agency */
+  insert into CITYDW.GOLD.SERVICE_REQUEST_SLA_SKETCH
+    (sla_level, agency_name, complaint_type, descriptor, borough, close_hours_state, n)
+  select
+    case when grouping(borough) = 0 then 1
+         when grouping(descriptor) = 0 then 2
+         when grouping(complaint_type) = 0 then 3
+         else 4 end as sla_level,
+    agency_name, complaint_type, descriptor, borough,
+    approx_percentile_accumulate(close_hours) as close_hours_state,
+    count(*) as n
+  from TMP_SLA_CLOSED
+  group by grouping sets (
+    (agency_name, complaint_type, descriptor, borough),
+    (agency_name, complaint_type, descriptor),
+    (agency_name, complaint_type),
+    (agency_name)
+  );
+
+  /* fold the new deltas into one sketch per key so the table stays key-sized */
+  insert overwrite into CITYDW.GOLD.SERVICE_REQUEST_SLA_SKETCH
+  select sla_level, agency_name, complaint_type, descriptor, borough,
+         approx_percentile_combine(close_hours_state), sum(n)
+  from CITYDW.GOLD.SERVICE_REQUEST_SLA_SKETCH
+  group by sla_level, agency_name, complaint_type, descriptor, borough;
+
+  /* resolve the borough -> descriptor -> type -> agency fallback once per open
+     signature, so the queue view needs a single equality lookup; thin groups
+     fall through to their parent level, the agency level is always usable */
+  insert overwrite into CITYDW.GOLD.SERVICE_REQUEST_SLA_TARGET
+  with q as (
+    select sla_level, agency_name, complaint_type, descriptor, borough, n,
+           approx_percentile_estimate(close_hours_state, 0.50) as p50,
+           approx_percentile_estimate(close_hours_state, 0.80) as p80,
+           approx_percentile_estimate(close_hours_state, 0.95) as p95
+    from CITYDW.GOLD.SERVICE_REQUEST_SLA_SKETCH
+  ),
+  sig as (
+    select distinct
+      coalesce(agency_name, '')    as agency_name,
+      coalesce(complaint_type, '') as complaint_type,
+      coalesce(descriptor, '')     as descriptor,
+      coalesce(borough, '')        as borough
+    from CITYDW.SILVER.V_SERVICE_REQUEST_INFRA
+    where is_open = 1
+  )
+  select s.agency_name, s.complaint_type, s.descriptor, s.borough,
+         h.sla_level, h.p50, h.p80, h.p95, h.n
+  from sig s
+  join q h
+    on h.agency_name = s.agency_name
+   and (h.sla_level = 4 or h.complaint_type = s.complaint_type)
+   and (h.sla_level >= 3 or h.descriptor = s.descriptor)
+   and (h.sla_level >= 2 or h.borough = s.borough)
+  where h.n >= :min_n or h.sla_level = 4
+  qualify row_number() over (
+    partition by s.agency_name, s.complaint_type, s.descriptor, s.borough
+    order by h.sla_level
+  ) = 1;
+end;
+
+/* tasks are created suspended; the first run reads every row of the stream,
+   so run it once now to build the sketches and targets */
+alter task TK_REFRESH_SLA_TARGETS resume;
+execute task TK_REFRESH_SLA_TARGETS;
@@ -0,0 +1,88 @@
+create or replace task TK_REFRESH_TRAFFIC_ANOMALY
+  warehouse = COMPUTE_WH
+  schedule = '60 MINUTE'
+  when system$stream_has_data('CITYDW.SILVER.ST_SV_TRAFFIC_DAILY_CELL')
+as
+begin
+  /* daily cell volumes added since the last run; the insert consumes the stream */
+  create or replace temporary table TMP_TRAFFIC_DAILY_BATCH (
+    h3_cell number(18,0), dte timestamp_ntz, weekday number(1,0), volume_veh_day number(38,0)
+  );
+  insert into TMP_TRAFFIC_DAILY_BATCH
+  select h3_cell, dte, dayofweekiso(dte), volume_veh_day
+  from CITYDW.SILVER.ST_SV_TRAFFIC_DAILY_CELL
+  where h3_cell is not null and volume_veh_day is not null;
+
+  /* score each new day against the cell's same-weekday baseline as it stood
+     before this batch (needs a few weeks of history and some spread) */
+  insert into CITYDW.GOLD.TRAFFIC_CELL_ANOMALY
+    (h3_cell, dte, weekday, volume_veh_day, baseline_n, baseline_mean, baseline_std, z_score, scored_at)
+  select b.h3_cell, b.dte, b.weekday, b.volume_veh_day,
+         s.n, s.mean, sqrt(s.m2 / (s.n - 1)),
+         (b.volume_veh_day - s.mean) / sqrt(s.m2 / (s.n - 1)),
+         current_timestamp()::timestamp_ntz
+  from TMP_TRAFFIC_DAILY_BATCH b
+  join CITYDW.GOLD.TRAFFIC_CELL_WEEKDAY_STATS s
+    on s.h3_cell = b.h3_cell and s.weekday = b.weekday
+  where s.n >= 4 and s.m2 > 0;
+
+  /* fold the batch into the running stats: per-key batch count/mean/M2, combined
+     with the stored state by the parallel form of Welford's update */
+  merge into CITYDW.GOLD.TRAFFIC_CELL_WEEKDAY_STATS s
+  using (
+    select h3_cell, weekday,
+           count(*) as n_b,
+           avg(volume_veh_day) as mean_b,
+           coalesce(var_pop(volume_veh_day) * count(*), 0) as m2_b,
+           max(dte) as last_dte
+    from TMP_TRAFFIC_DAILY_BATCH
+    group by h3_cell, weekday
+  ) b
+  on s.h3_cell = b.h3_cell and s.weekday = b.weekday
+  when matched then update set
+    n = s.n + b.n_b,
+    mean = s.mean + (b.mean_b - s.mean) * b.n_b / (s.n + b.n_b),
+    m2 = s.m2 + b.m2_b + (b.mean_b - s.mean) * (b.mean_b - s.mean) * s.n * b.n_b / (s.n + b.n_b),
+    last_dte = greatest(s.last_dte, b.last_dte)
+  when not matched then insert (h3_cell, weekday, n, mean, m2, last_dte)
+    values (b.h3_cell, b.weekday, b.n_b, b.mean_b, b.m2_b, b.last_dte);
+
+  /* nothing scored yet (the first run only builds the baselines): score the
+     batch's most recent days against the baselines just built, each with its own
+     value taken back out (Welford's update in reverse) so it is not compared
+     with itself */
+  let backfill_days number := 14;
+  let n_scored number := (select count(*) from CITYDW.GOLD.TRAFFIC_CELL_ANOMALY);
+  if (n_scored = 0) then
+    insert into CITYDW.GOLD.TRAFFIC_CELL_ANOMALY
+      (h3_cell, dte, weekday, volume_veh_day, baseline_n, baseline_mean, baseline_std, z_score, scored_at)
+    with loo as (
+      select b.h3_cell, b.dte, b.weekday, b.volume_veh_day,
+             s.n - 1 as n,
+             s.mean - (b.volume_veh_day - s.mean) / (s.n - 1) as mean,
+             s.m2 - (b.volume_veh_day - (s.mean - (b.volume_veh_day - s.mean) / (s.n - 1)))
+                  * (b.volume_veh_day - s.mean) as m2
+      from TMP_TRAFFIC_DAILY_BATCH b
+      join CITYDW.GOLD.TRAFFIC_CELL_WEEKDAY_STATS s
+        on s.h3_cell = b.h3_cell and s.weekday = b.weekday
+      where b.dte > (select dateadd('day', -:backfill_days, max(dte)) from TMP_TRAFFIC_DAILY_BATCH)
+        and s.n >= 5
+    )
+    select h3_cell, dte, weekday, volume_veh_day,
+           n, mean, sqrt(m2 / (n - 1)),
+           (volume_veh_day - mean) / sqrt(m2 / (n - 1)),
+           current_timestamp()::timestamp_ntz
+    from loo
+    where m2 > 0;
+  end if;
+
+  /* scores are only read for recent days (relative to the data, which may lag) */
+  delete from CITYDW.GOLD.TRAFFIC_CELL_ANOMALY
+  where dte < (select dateadd('day', -90, max(dte)) from CITYDW.GOLD.TRAFFIC_CELL_ANOMALY);
+end;
+
+/* tasks are created suspended; one run now folds the stream's initial rows
+   (all of SV_TRAFFIC_DAILY_CELL) into the weekday baselines and scores the
+   last 14 days against them, so the Live tab has results before the next load */
+alter task TK_REFRESH_TRAFFIC_ANOMALY resume;
+execute task TK_REFRESH_TRAFFIC_ANOMALY;
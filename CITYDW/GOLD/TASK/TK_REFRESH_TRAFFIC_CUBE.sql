@@ -0,0 +1,75 @@
+create or replace task TK_REFRESH_TRAFFIC_CUBE
+  warehouse = COMPUTE_WH
+  schedule = '60 MINUTE'
+  when system$stream_has_data('CITYDW.BRONZE.ST_BR_TRAFFIC_RAW')
+as
+begin
+  /* raw counts loaded since the last run (all of them on the first run); the
+     insert consumes the stream, later statements read the temp copy */
+  create or replace temporary table TMP_TRAFFIC_BATCH (
+    dte date, wktgeom varchar, borough varchar, direction varchar, vol number(38,0)
+  );
+  insert into TMP_TRAFFIC_BATCH
+  select date_from_parts(yr, m, d), wktgeom, boro, direction, vol
+  from CITYDW.BRONZE.ST_BR_TRAFFIC_RAW
+  where yr is not null and m is not null and d is not null;
+
+  /* seed the segment -> cell map from SV_TRAFFIC once, then place new segments
+     (state-plane WKT) at the same H3 resolution; traffic_ingest.py reads the
+     resolution with the same expression (H3_RES_SQL) */
+  insert into CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL (wktgeom, h3_cell)
+  select wktgeom, any_value(h3_cell)
+  from CITYDW.SILVER.SV_TRAFFIC
+  where h3_cell is not null
+    and not exists (select 1 from CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL)
+  group by wktgeom;
+
+  let res number := (select coalesce(max(h3_get_resolution(h3_cell)), 9) from CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL);
+
+  insert into CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL (wktgeom, h3_cell)
+  select n.wktgeom,
+         h3_point_to_cell(to_geography(st_aswkb(st_centroid(st_transform(to_geometry(n.wktgeom, 2263), 4326)))), :res)
+  from (select distinct wktgeom from TMP_TRAFFIC_BATCH where wktgeom is not null) n
+  where not exists (select 1 from CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL s where s.wktgeom = n.wktgeom);
+
+  /* add the batch to the day x cell x borough x direction cube */
+  merge into CITYDW.GOLD.TRAFFIC_CUBE_DAILY c
+  using (
+    select b.dte, year(b.dte) as traffic_year, month(b.dte) as traffic_month,
+           s.h3_cell, b.borough, b.direction,
+           sum(b.vol) as volume_veh, count(*) as n_obs
+    from TMP_TRAFFIC_BATCH b
+    left join CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL s
+      on s.wktgeom = b.wktgeom
+    group by 1, 2, 3, 4, 5, 6
+  ) n
+  on c.dte = n.dte
+  and equal_null(c.h3_cell, n.h3_cell)
+  and equal_null(c.borough, n.borough)
+  and equal_null(c.direction, n.direction)
+  when matched then update set
+    volume_veh = c.volume_veh + n.volume_veh, n_obs = c.n_obs + n.n_obs
+  when not matched then insert (dte, traffic_year, traffic_month, h3_cell, borough, direction, volume_veh, n_obs)
+    values (n.dte, n.traffic_year, n.traffic_month, n.h3_cell, n.borough, n.direction, n.volume_veh, n.n_obs);
+
+  /* and to the year x cell rollup the growth page reads */
+  merge into CITYDW.GOLD.TRAFFIC_CUBE_YEAR_CELL c
+  using (
+    select year(b.dte) as traffic_year, s.h3_cell, sum(b.vol) as volume_veh, count(*) as n_obs
+    from TMP_TRAFFIC_BATCH b
+    left join CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL s
+      on s.wktgeom = b.wktgeom
+    group by 1, 2
+  ) n
+  on c.traffic_year = n.traffic_year
+  and equal_null(c.h3_cell, n.h3_cell)
+  when matched then update set
+    volume_veh = c.volume_veh + n.volume_veh, n_obs = c.n_obs + n.n_obs
+  when not matched then insert (traffic_year, h3_cell, volume_veh, n_obs)
+    values (n.traffic_year, n.h3_cell, n.volume_veh, n.n_obs);
+end;
+
+/* tasks are created suspended; the stream's initial rows are all of
+   BR_TRAFFIC_RAW, so one run now builds the cube from the full history */
+alter task TK_REFRESH_TRAFFIC_CUBE resume;
+execute task TK_REFRESH_TRAFFIC_CUBE;
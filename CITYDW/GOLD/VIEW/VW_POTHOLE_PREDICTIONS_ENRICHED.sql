@@ -6,9 +6,11 @@ select
   p.actual_label,
   p.predicted_label,
   p.probability,
-  /* centroids for map pins */
-  st_y(st_centroid(to_geography(h3_cell_to_boundary(p.h3_cell)))) as lat,
-  st_x(st_centroid(to_geography(h3_cell_to_boundary(p.h3_cell)))) as lon
+  /* centroids for map pins (precomputed once per cell) */
+  g.lat,
+  g.lon
 from POTHOLE_PREDICTIONS p
 left join CITYDW.SILVER.SV_H3_BOROUGH b
-  on b.h3_cell = p.h3_cell;
+  on b.h3_cell = p.h3_cell
+left join CITYDW.SILVER.SV_H3_CELL_GEOMETRY g
+  on g.h3_cell = p.h3_cell;
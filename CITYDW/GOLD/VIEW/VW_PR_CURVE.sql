@@ -1,10 +1,28 @@
 create or replace view VW_PR_CURVE as
+with by_prob as (
+  /* one row per distinct probability instead of one per prediction x threshold */
+  select probability,
+         count(*)                    as n,
+         sum(iff(actual_label=1,1,0)) as pos
+  from POTHOLE_PREDICTIONS
+  group by 1
+),
+cum as (
+  select probability,
+         sum(n)   over (order by probability desc rows between unbounded preceding and current row) as n_ge,
+         sum(pos) over (order by probability desc rows between unbounded preceding and current row) as tp_ge
+  from by_prob
+  where probability is not null
+)
 select
-  th,
-  case when sum(iff(probability>=th,1,0))=0 then null
-       else 100.0*sum(iff(probability>=th and actual_label=1,1,0))/sum(iff(probability>=th,1,0)) end  as precision_pct,
-  case when sum(iff(actual_label=1,1,0))=0 then null
-       else 100.0*sum(iff(probability>=th and actual_label=1,1,0))/sum(iff(actual_label=1,1,0)) end    as recall_pct
-from POTHOLE_PREDICTIONS, TMP_THRESHOLDS
-group by th
+  t.th,
+  case when coalesce(c.n_ge,0)=0 then null
+       else 100.0*c.tp_ge/c.n_ge end                                                as precision_pct,
+  case when coalesce(tot.pos_total,0)=0 then null
+       else 100.0*coalesce(c.tp_ge,0)/tot.pos_total end                              as recall_pct
+from TMP_THRESHOLDS t
+/* smallest probability >= th carries the cumulative counts for that threshold */
+asof join cum c
+  match_condition (t.th <= c.probability)
+cross join (select sum(pos) as pos_total from by_prob) tot
 order by th;
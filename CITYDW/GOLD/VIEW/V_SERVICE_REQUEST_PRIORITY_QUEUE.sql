@@ -2,23 +2,17 @@ create or replace view GOLD.V_SERVICE_REQUEST_PRIORITY_QUEUE as
 with base as (
   select
     v.*,
-    coalesce(boro.p50_close_hours,
-             d.p50_close_hours,
-             t.p50_close_hours,
-             a.p50_close_hours,
-             48) as target_hours,
+    coalesce(sla.p50_close_hours, 48) as target_hours,
+    sla.p80_close_hours as target_p80_hours,
+    sla.p95_close_hours as target_p95_hours,
     coalesce(rep.recent_similar_count, 0) as recent_similar_count
   from SILVER.V_SERVICE_REQUEST_WITH_SEVERITY v
-  left join GOLD.SERVICE_REQUEST_SLA_BORO boro
-    on v.agency_name=boro.agency_name and v.complaint_type=boro.complaint_type
-   and v.descriptor=boro.descriptor and v.borough=boro.borough
-  left join GOLD.SERVICE_REQUEST_SLA_DESC d
-    on v.agency_name=d.agency_name and v.complaint_type=d.complaint_type
-   and v.descriptor=d.descriptor
-  left join GOLD.SERVICE_REQUEST_SLA_TYPE t
-    on v.agency_name=t.agency_name and v.complaint_type=t.complaint_type
-  left join GOLD.SERVICE_REQUEST_SLA_AGENCY a
-    on v.agency_name=a.agency_name
+  -- fallback (borough -> descriptor -> type -> agency) is pre-resolved per signature
+  left join GOLD.SERVICE_REQUEST_SLA_TARGET sla
+    on sla.agency_name    = coalesce(v.agency_name, '')
+   and sla.complaint_type = coalesce(v.complaint_type, '')
+   and sla.descriptor     = coalesce(v.descriptor, '')
+   and sla.borough        = coalesce(v.borough, '')
   left join GOLD.V_SERVICE_REQUEST_RECENT_REPEATS rep
     on v.agency_name=rep.agency_name
    and v.complaint_type=rep.complaint_type
@@ -54,6 +48,8 @@ select
   agency_name, complaint_type, descriptor, borough,
   unique_key, created_ts, status,
   age_hours, safe_target_hours as target_hours,
+  target_hours as raw_target_hours,
+  target_p80_hours, target_p95_hours,
   round(breach_risk_raw,3) as breach_risk,
   sev as severity,
   recent_similar_count,
@@ -1,7 +1,6 @@
 create or replace view GOLD.V_SERVICE_REQUEST_RECENT_REPEATS as
+-- 32-day window kept by TK_REFRESH_REPEAT_COUNTS in daily buckets; reads are a keyed lookup
 select
   agency_name, complaint_type, descriptor, H3_CELL,
-  count(*) as recent_similar_count
-from SILVER.V_SERVICE_REQUEST_WITH_SEVERITY
-where created_ts >= dateadd('day', -32, current_timestamp())
-group by 1,2,3,4;
+  recent_similar_count
+from GOLD.SERVICE_REQUEST_REPEAT_COUNT;
@@ -0,0 +1,4 @@
+create or replace stage SV_TRAFFIC_STAGE
+	file_format = (type = parquet use_logical_type = true)
+	encryption = (type = 'SNOWFLAKE_SSE')
+	comment = 'Parquet parts written by ingest/traffic_ingest.py, loaded into SV_TRAFFIC by its COPY_SQL';
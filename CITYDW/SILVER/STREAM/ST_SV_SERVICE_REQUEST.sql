@@ -0,0 +1,3 @@
+create or replace stream ST_SV_SERVICE_REQUEST
+  on table SV_SERVICE_REQUEST
+  show_initial_rows = true;
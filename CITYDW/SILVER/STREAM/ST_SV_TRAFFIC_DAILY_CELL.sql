@@ -0,0 +1,4 @@
+create or replace stream ST_SV_TRAFFIC_DAILY_CELL
+  on table SV_TRAFFIC_DAILY_CELL
+  append_only = true
+  show_initial_rows = true;
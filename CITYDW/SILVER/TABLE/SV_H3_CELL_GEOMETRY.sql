@@ -0,0 +1,6 @@
+create or replace TABLE SV_H3_CELL_GEOMETRY (
+	H3_CELL NUMBER(18,0),
+	LAT FLOAT,
+	LON FLOAT,
+	BOUNDARY_GEOJSON VARCHAR(16777216)
+);
@@ -0,0 +1,8 @@
+create or replace TABLE SV_SEVERITY_SIGNATURE (
+	AGENCY_NAME VARCHAR(16777216),
+	COMPLAINT_TYPE VARCHAR(16777216),
+	DESCRIPTOR VARCHAR(16777216),
+	SEVERITY NUMBER(1,0),
+	RULES_HASH NUMBER(19,0),
+	EVALUATED_AT TIMESTAMP_NTZ(9)
+);
@@ -0,0 +1,13 @@
+create or replace TABLE SV_TRAFFIC_ROLL_CELL (
+	H3_CELL NUMBER(18,0),
+	DTE DATE,
+	VOLUME_VEH_DAY NUMBER(38,0),
+	HAS_COUNT BOOLEAN,
+	VOLUME_VEH_7D NUMBER(38,0),
+	VOLUME_VEH_14D NUMBER(38,0),
+	VOLUME_VEH_30D NUMBER(38,0),
+	DAYS_7D NUMBER(2,0),
+	DAYS_14D NUMBER(2,0),
+	DAYS_30D NUMBER(2,0),
+	VOLUME_VEH_7D_AVG FLOAT
+);
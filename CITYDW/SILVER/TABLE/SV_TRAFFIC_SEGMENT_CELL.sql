@@ -0,0 +1,4 @@
+create or replace TABLE SV_TRAFFIC_SEGMENT_CELL (
+	WKTGEOM VARCHAR(16777216),
+	H3_CELL NUMBER(18,0)
+);
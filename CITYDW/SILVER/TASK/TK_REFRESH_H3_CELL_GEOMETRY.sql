@@ -0,0 +1,33 @@
+create or replace task TK_REFRESH_H3_CELL_GEOMETRY
+  warehouse = COMPUTE_WH
+  schedule = 'USING CRON 0 3 * * * UTC'
+as
+merge into CITYDW.SILVER.SV_H3_CELL_GEOMETRY g
+using (
+  /* only cells we have never seen get a boundary computed */
+  select c.h3_cell,
+         st_y(st_centroid(to_geography(h3_cell_to_boundary(c.h3_cell)))) as lat,
+         st_x(st_centroid(to_geography(h3_cell_to_boundary(c.h3_cell)))) as lon,
+         st_asgeojson(h3_cell_to_boundary(c.h3_cell))::string as boundary_geojson
+  from (
+    select h3_cell from CITYDW.SILVER.SV_ACTIVE_CELLS
+    union
+    select h3_cell from CITYDW.SILVER.SV_H3_BOROUGH
+    union
+    select h3_cell from CITYDW.SILVER.SV_TRAFFIC_DAILY_CELL
+    union
+    select h3_cell from CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL
+    union
+    select h3_cell from CITYDW.GOLD.POTHOLE_PREDICTIONS
+  ) c
+  where c.h3_cell is not null
+    and not exists (select 1 from CITYDW.SILVER.SV_H3_CELL_GEOMETRY x where x.h3_cell = c.h3_cell)
+) n
+on g.h3_cell = n.h3_cell
+when not matched then insert (h3_cell, lat, lon, boundary_geojson)
+  values (n.h3_cell, n.lat, n.lon, n.boundary_geojson);
+
+/* tasks are created suspended, and the enriched predictions view reads lat/lon
+   from this table: resume it and run it once now to fill every known cell */
+alter task TK_REFRESH_H3_CELL_GEOMETRY resume;
+execute task TK_REFRESH_H3_CELL_GEOMETRY;
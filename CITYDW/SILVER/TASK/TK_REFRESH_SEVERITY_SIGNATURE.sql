@@ -0,0 +1,54 @@
+create or replace task TK_REFRESH_SEVERITY_SIGNATURE
+  warehouse = COMPUTE_WH
+  schedule = '30 MINUTE'
+as
+merge into CITYDW.SILVER.SV_SEVERITY_SIGNATURE s
+using (
+  with rules as (
+    select * from CITYDW.SILVER.SERVICE_REQUEST_SEVERITY_RULES
+  ),
+  rules_version as (
+    select coalesce(hash_agg(pattern_agency, pattern_type, pattern_desc, severity), 0) as rules_hash
+    from rules
+  ),
+  /* signatures never evaluated, or evaluated against an older rule set;
+     keys are stored as the '' -coalesced strings the patterns are matched against */
+  pending as (
+    select distinct
+      coalesce(v.agency_name, '')    as agency_name,
+      coalesce(v.complaint_type, '') as complaint_type,
+      coalesce(v.descriptor, '')     as descriptor
+    from CITYDW.SILVER.V_SERVICE_REQUEST_INFRA v
+    where not exists (
+      select 1
+      from CITYDW.SILVER.SV_SEVERITY_SIGNATURE x, rules_version rv
+      where x.agency_name    = coalesce(v.agency_name, '')
+        and x.complaint_type = coalesce(v.complaint_type, '')
+        and x.descriptor     = coalesce(v.descriptor, '')
+        and x.rules_hash     = rv.rules_hash
+    )
+  )
+  /* each signature is matched against the rules once; highest severity wins */
+  select p.agency_name, p.complaint_type, p.descriptor,
+         max(coalesce(r.severity, 3)) as severity,
+         any_value(rv.rules_hash) as rules_hash
+  from pending p
+  cross join rules_version rv
+  left join rules r
+    on (r.pattern_agency is null or regexp_like(p.agency_name,    r.pattern_agency, 'i'))
+   and (r.pattern_type   is null or regexp_like(p.complaint_type, r.pattern_type,   'i'))
+   and (r.pattern_desc   is null or regexp_like(p.descriptor,     r.pattern_desc,   'i'))
+  group by p.agency_name, p.complaint_type, p.descriptor
+) n
+on s.agency_name = n.agency_name
+and s.complaint_type = n.complaint_type
+and s.descriptor = n.descriptor
+when matched then update set
+  severity = n.severity, rules_hash = n.rules_hash, evaluated_at = current_timestamp()::timestamp_ntz
+when not matched then insert (agency_name, complaint_type, descriptor, severity, rules_hash, evaluated_at)
+  values (n.agency_name, n.complaint_type, n.descriptor, n.severity, n.rules_hash, current_timestamp()::timestamp_ntz);
+
+/* tasks are created suspended; the first run evaluates every signature, so
+   run it once now rather than leaving the lookup empty until the schedule fires */
+alter task TK_REFRESH_SEVERITY_SIGNATURE resume;
+execute task TK_REFRESH_SEVERITY_SIGNATURE;
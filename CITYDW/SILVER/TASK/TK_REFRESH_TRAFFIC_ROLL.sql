@@ -0,0 +1,103 @@
+create or replace task TK_REFRESH_TRAFFIC_ROLL
+  warehouse = COMPUTE_WH
+  schedule = 'USING CRON 0 5 * * * UTC'
+as
+begin
+  /* last materialized day across all cells */
+  let w date := (select coalesce(max(dte), '1900-01-01'::date) from CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL);
+
+  /* cell-days loaded since the last run, whatever day they are for, so counts
+     that land late are rolled too; the insert consumes the stream (every row on
+     the first run) */
+  create or replace temporary table TMP_ROLL_NEW (h3_cell number(18,0), dte date);
+  insert into TMP_ROLL_NEW
+  select distinct h3_cell, dte::date
+  from CITYDW.SILVER.ST_SV_TRAFFIC_DAILY_CELL_ROLL
+  where h3_cell is not null;
+
+  let w_new date := (select max(dte) from TMP_ROLL_NEW);
+  if (w_new is null) then
+    return 'no new rows';
+  end if;
+  let w_end date := greatest(:w, :w_new);
+
+  /* per cell, the first day whose windows change: its earliest new cell-day, or
+     the day after w for cells still inside a 30-day window, which are carried
+     forward to w_end */
+  create or replace temporary table TMP_ROLL_CELLS as
+    select h3_cell, min(from_dte) as from_dte
+    from (
+      select h3_cell, min(dte) as from_dte
+      from TMP_ROLL_NEW
+      group by h3_cell
+      union all
+      select h3_cell, dateadd('day', 1, :w)
+      from CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL
+      where dte = :w and days_30d > 0
+    )
+    group by h3_cell
+    having min(from_dte) <= :w_end;
+
+  delete from CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL r
+  using TMP_ROLL_CELLS c
+  where r.h3_cell = c.h3_cell
+    and r.dte >= c.from_dte;
+
+  /* one row per cell per calendar day from from_dte to w_end: days a counter
+     missed are filled with volume 0 / has_count false, so a k-row window is
+     exactly k days. Volumes are re-read from SV_TRAFFIC_DAILY_CELL for the 30
+     days before from_dte onwards, so a late count adds to any day it lands on. */
+  insert into CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL
+    (h3_cell, dte, volume_veh_day, has_count, volume_veh_7d, volume_veh_14d, volume_veh_30d,
+     days_7d, days_14d, days_30d, volume_veh_7d_avg)
+  with days as (
+    select dateadd('day', row_number() over (order by seq4()) - 1,
+                   (select dateadd('day', -30, min(from_dte)) from TMP_ROLL_CELLS)) as dte
+    from table(generator(rowcount => 100000))
+  ),
+  vols as (
+    select d.h3_cell, d.dte::date as dte, sum(d.volume_veh_day) as v
+    from CITYDW.SILVER.SV_TRAFFIC_DAILY_CELL d
+    join TMP_ROLL_CELLS c
+      on c.h3_cell = d.h3_cell
+    where d.dte >= dateadd('day', -30, c.from_dte)
+    group by 1, 2
+  ),
+  series as (
+    select c.h3_cell, c.from_dte, dd.dte,
+           coalesce(v.v, 0) as v,
+           iff(v.v is not null, 1, 0) as has
+    from TMP_ROLL_CELLS c
+    join days dd
+      on dd.dte between dateadd('day', -30, c.from_dte) and :w_end
+    left join vols v
+      on v.h3_cell = c.h3_cell and v.dte = dd.dte
+  ),
+  /* running totals: a k-day sum is the prefix sum with the leaving day's prefix
+     subtracted, over the 30-day lead-in plus the rewritten days only */
+  prefix as (
+    select h3_cell, from_dte, dte, v, has,
+           sum(v)   over (partition by h3_cell order by dte rows between unbounded preceding and current row) as cv,
+           sum(has) over (partition by h3_cell order by dte rows between unbounded preceding and current row) as ch
+    from series
+  ),
+  rolled as (
+    select h3_cell, from_dte, dte, v, has,
+           cv - coalesce(lag(cv, 7)  over (partition by h3_cell order by dte), 0) as vol_7d,
+           cv - coalesce(lag(cv, 14) over (partition by h3_cell order by dte), 0) as vol_14d,
+           cv - coalesce(lag(cv, 30) over (partition by h3_cell order by dte), 0) as vol_30d,
+           ch - coalesce(lag(ch, 7)  over (partition by h3_cell order by dte), 0) as days_7d,
+           ch - coalesce(lag(ch, 14) over (partition by h3_cell order by dte), 0) as days_14d,
+           ch - coalesce(lag(ch, 30) over (partition by h3_cell order by dte), 0) as days_30d
+    from prefix
+  )
+  select h3_cell, dte, v, has = 1, vol_7d, vol_14d, vol_30d, days_7d, days_14d, days_30d,
+         vol_7d / nullif(days_7d, 0)
+  from rolled
+  where dte >= from_dte;
+end;
+
+/* tasks are created suspended; on the first run the stream returns every row of
+   SV_TRAFFIC_DAILY_CELL, so run it once now */
+alter task TK_REFRESH_TRAFFIC_ROLL resume;
+execute task TK_REFRESH_TRAFFIC_ROLL;
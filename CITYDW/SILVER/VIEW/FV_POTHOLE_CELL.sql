@@ -21,11 +21,16 @@ nbh_hist as (
   from LB_BASE b
 ),
 traffic_7d as (
+  -- materialized rolling store, no re-windowing. Only days with a count, as
+  -- before: gap days stay null rather than taking the store's filled rows.
+  -- The average is over the counted days in the last 7 calendar days
+  -- (previously the last 7 counted days).
   select
     h3_cell,
     dte as asof_day,
     volume_veh_7d_avg
-  from CITYDW.SILVER.V_TRAFFIC_ROLL_7D
+  from CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL
+  where has_count
 )
 select
   l.h3_cell,
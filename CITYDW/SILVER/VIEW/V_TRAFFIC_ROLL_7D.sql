@@ -1,10 +1,9 @@
 create or replace view V_TRAFFIC_ROLL_7D as
+-- materialized by TK_REFRESH_TRAFFIC_ROLL: average over the days with counts
+-- in the last 7 calendar days (gaps no longer stretch the window)
 select
   h3_cell,
   dte,
-  avg(volume_veh_day) over (
-    partition by h3_cell
-    order by dte
-    rows between 6 preceding and current row
-  ) as volume_veh_7d_avg
-from SV_TRAFFIC_DAILY_CELL;
+  volume_veh_7d_avg
+from CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL
+where has_count;
@@ -0,0 +1,262 @@
+"""
+FV_POTHOLE_CELL feature engine.
+
+Builds the CLF_TRAIN feature rows for every (H3_CELL, ASOF_DAY) in LB_BASE
+without the view's correlated subqueries. Daily pothole counts are laid out
+as a dense cell x day matrix; 7/30-day sums come from a cumulative sum along
+the day axis (one subtraction per row) and the neighbour sum from the
+H3 ring-1 adjacency applied to the 30-day window matrix:
+
+    python pothole_features.py --connection dev --parity
+    python pothole_features.py --connection dev --out CLF_TRAIN_ENGINE
+    python pothole_features.py --benchmark 200000 --check 2000
+
+The remaining columns (weather, pavement, traffic, label) are plain keyed
+lookups and are joined exactly as the view joins them.
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = ["ASOF_DAY", "H3_CELL", "POTHOLE_7D", "POTHOLE_30D", "NBH_POTHOLE_30D",
+                   "FREEZE_THAW_14D", "PRCP_7D", "MONTH_NUM", "PAVEMENT_RATING_AVG",
+                   "VOLUME_VEH_7D_AVG", "LABEL_14D"]
+KEYS = ["h3_cell", "asof_day"]
+# view windows are `between asof_day - interval 'N day' and asof_day`: N + 1 days inclusive
+BACK_7D, BACK_30D = 7, 30
+
+_BASE_RANGE = "(select min(asof_day) - interval '30 day' from CITYDW.SILVER.LB_BASE) and (select max(asof_day) from CITYDW.SILVER.LB_BASE)"
+SOURCE_SQL = {
+    "base": "select h3_cell, asof_day from CITYDW.SILVER.LB_BASE",
+    "daily": f"""
+        select h3_cell, dte, pothole_ct
+        from CITYDW.SILVER.V_311_POTHOLE_DAILY
+        where h3_cell is not null and dte between {_BASE_RANGE}""",
+    "neighbors": """
+        select h3_cell, nbh_cell::number as nbh_cell
+        from CITYDW.SILVER.V_CELL_NEIGHBORS
+        where h3_cell in (select h3_cell from CITYDW.SILVER.LB_BASE)""",
+    "weather": "select dte, freeze_thaw_14d, prcp_7d, month_num from CITYDW.SILVER.V_WX_ROLL",
+    "pavement": "select h3_cell, asof_day, pavement_rating_avg from CITYDW.SILVER.V_PAVEMENT_CELL_ASOF",
+    "traffic": f"""
+        select h3_cell, dte as asof_day, volume_veh_7d_avg
+        from CITYDW.SILVER.SV_TRAFFIC_ROLL_CELL
+        where dte between {_BASE_RANGE}""",
+    "label": "select h3_cell, asof_day, label_14d from CITYDW.SILVER.LB_POTHOLE_14D",
+}
+VIEW_SQL = "select * from CITYDW.SILVER.FV_POTHOLE_CELL"
+
+def lc(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [c.lower() for c in df.columns]
+    return df
+
+# ----------------- dense layout -----------------
+def cell_index(cells: np.ndarray, universe: np.ndarray) -> np.ndarray:
+    """Row of each cell id in the sorted universe (every id must be present)."""
+    return np.searchsorted(universe, cells)
+
+def day_offsets(days: pd.Series, day0: np.datetime64) -> np.ndarray:
+    return ((pd.to_datetime(days).dt.normalize().to_numpy("datetime64[D]") - day0)
+            .astype(np.int64))
+
+def prefix_counts(rows: np.ndarray, cols: np.ndarray, counts: np.ndarray,
+                  n_rows: int, n_days: int) -> np.ndarray:
+    """
+    Dense (n_rows + 1) x (n_days + 1) prefix sums: P[r, j] = counts of row r on
+    days < j. The extra last row stays zero so padded neighbour slots read 0.
+    """
+    dense = np.zeros((n_rows + 1, n_days + 1), dtype=np.int32)
+    np.add.at(dense, (rows, cols + 1), counts.astype(np.int32))
+    return np.cumsum(dense, axis=1, out=dense)
+
+def window_sum(prefix: np.ndarray, rows: np.ndarray, days: np.ndarray, back: int) -> np.ndarray:
+    """Sum over days [day - back, day] for each (row, day) pair."""
+    return prefix[rows, days + 1] - prefix[rows, np.maximum(days - back, 0)]
+
+def neighbour_slots(src: np.ndarray, dst: np.ndarray, n_rows: int) -> np.ndarray:
+    """
+    Row-padded (ELL) form of the 0/1 adjacency A[src, dst]: slot k of row r is
+    the k-th neighbour row, or n_rows (the zero row) past the row's degree.
+    Duplicate edges are kept, as the view's join keeps them.
+    """
+    order = np.argsort(src, kind="stable")
+    src, dst = src[order], dst[order]
+    degree = np.bincount(src, minlength=n_rows)
+    slots = np.full((n_rows, max(int(degree.max(initial=0)), 1)), n_rows, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(degree)[:-1]))
+    slots[src, np.arange(len(src)) - starts[src]] = dst
+    return slots
+
+def pothole_windows(base: pd.DataFrame, daily: pd.DataFrame, neighbors: pd.DataFrame) -> pd.DataFrame:
+    """
+    pothole_7d, pothole_30d and nbh_pothole_30d for each base row. The
+    neighbour sum is (A . W30)[cell, day], taken only at the base pairs: one
+    gather per adjacency slot instead of a per-row scan of the daily counts.
+    """
+    base_cells = base["h3_cell"].to_numpy(np.int64)
+    nb_src = neighbors["h3_cell"].to_numpy(np.int64)
+    nb_dst = neighbors["nbh_cell"].to_numpy(np.int64)
+    # only base cells and their neighbours can ever be read
+    universe = np.unique(np.concatenate([base_cells, nb_src, nb_dst]))
+    d_cells = daily["h3_cell"].to_numpy(np.int64)
+    pos = np.minimum(np.searchsorted(universe, d_cells), len(universe) - 1)
+    keep = universe[pos] == d_cells if len(universe) else np.zeros(len(d_cells), bool)
+
+    day0 = pd.to_datetime(base["asof_day"]).min().normalize().to_datetime64().astype("datetime64[D]") - BACK_30D
+    base_days = day_offsets(base["asof_day"], day0)
+    n_days = int(base_days.max(initial=0)) + 1
+    d_days = day_offsets(daily["dte"], day0)
+    keep &= (d_days >= 0) & (d_days < n_days)
+
+    n_rows = len(universe)
+    prefix = prefix_counts(pos[keep], d_days[keep],
+                           daily["pothole_ct"].to_numpy(np.int64)[keep], n_rows, n_days)
+    rows = cell_index(base_cells, universe)
+    out = base[KEYS].copy()
+    out["pothole_7d"] = window_sum(prefix, rows, base_days, BACK_7D)
+    out["pothole_30d"] = window_sum(prefix, rows, base_days, BACK_30D)
+
+    slots = neighbour_slots(cell_index(nb_src, universe), cell_index(nb_dst, universe), n_rows)
+    nbh = np.zeros(len(base), dtype=np.int64)
+    for k in range(slots.shape[1]):
+        nbh += window_sum(prefix, slots[rows, k], base_days, BACK_30D)
+    out["nbh_pothole_30d"] = nbh
+    return out
+
+# ----------------- full feature rows -----------------
+def _day_key(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    df[col] = pd.to_datetime(df[col]).dt.normalize()
+    return df
+
+def build_features(src: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """CLF_TRAIN-shaped rows from the lowercase source frames in SOURCE_SQL."""
+    base = _day_key(src["base"].copy(), "asof_day")
+    daily = _day_key(src["daily"].copy(), "dte")
+    out = base.merge(pothole_windows(base.drop_duplicates(KEYS), daily, src["neighbors"]), on=KEYS, how="left")
+    wx = _day_key(src["weather"].rename(columns={"dte": "asof_day"}), "asof_day")
+    out = out.merge(wx, on="asof_day", how="left")
+    for name in ("pavement", "traffic", "label"):
+        out = out.merge(_day_key(src[name].copy(), "asof_day"), on=KEYS, how="left")
+    out.columns = [c.upper() for c in out.columns]
+    return out[FEATURE_COLUMNS]
+
+def load_sources(session) -> Dict[str, pd.DataFrame]:
+    return {name: lc(session.sql(sql).to_pandas()) for name, sql in SOURCE_SQL.items()}
+
+# ----------------- parity / benchmark -----------------
+def compare(engine: pd.DataFrame, view: pd.DataFrame, atol: float = 1e-6) -> Dict[str, int]:
+    """Mismatching rows per column after aligning both frames on the keys."""
+    engine, view = engine.copy(), view.copy()
+    view.columns = [c.upper() for c in view.columns]
+    keys = ["H3_CELL", "ASOF_DAY"]
+    for df in (engine, view):
+        df["ASOF_DAY"] = pd.to_datetime(df["ASOF_DAY"]).dt.normalize()
+    a = engine.sort_values(keys, kind="stable").reset_index(drop=True)
+    b = view[FEATURE_COLUMNS].sort_values(keys, kind="stable").reset_index(drop=True)
+    if len(a) != len(b):
+        return {"ROWS": abs(len(a) - len(b))}
+    diff = {}
+    for col in FEATURE_COLUMNS:
+        x, y = a[col], b[col]
+        if col == "ASOF_DAY":
+            bad = x.ne(y)
+        else:
+            x = pd.to_numeric(x, errors="coerce").to_numpy(float)
+            y = pd.to_numeric(y, errors="coerce").to_numpy(float)
+            bad = ~(np.isclose(x, y, atol=atol) | (np.isnan(x) & np.isnan(y)))
+        diff[col] = int(np.sum(bad))
+    return diff
+
+def reference_windows(base: pd.DataFrame, daily: pd.DataFrame, neighbors: pd.DataFrame) -> pd.DataFrame:
+    """The view's correlated subqueries, row by row, for checking the engine."""
+    by_cell = {c: g for c, g in daily.groupby("h3_cell")}
+    nbrs = neighbors.groupby("h3_cell")["nbh_cell"].apply(list).to_dict()
+    empty = daily.iloc[:0]
+
+    def window(cell, day, back):
+        g = by_cell.get(cell, empty)
+        return int(g.loc[(g["dte"] >= day - pd.Timedelta(days=back)) & (g["dte"] <= day), "pothole_ct"].sum())
+
+    rows = [(c, d, window(c, d, BACK_7D), window(c, d, BACK_30D),
+             sum(window(n, d, BACK_30D) for n in nbrs.get(c, [])))
+            for c, d in zip(base["h3_cell"], base["asof_day"])]
+    return pd.DataFrame(rows, columns=KEYS + ["pothole_7d", "pothole_30d", "nbh_pothole_30d"])
+
+def synthetic_sources(rows: int, cells: int = 20_000, days: int = 730, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """LB_BASE / daily counts / ring-1 neighbours shaped like the warehouse sources."""
+    rng = np.random.default_rng(seed)
+    ids = np.sort(rng.choice(np.arange(600_000_000_000_000_000, 600_000_000_010_000_000), cells, replace=False))
+    day0 = np.datetime64("2023-01-01")
+    base = pd.DataFrame({"h3_cell": rng.choice(ids, rows),
+                         "asof_day": day0 + rng.integers(BACK_30D, days, rows).astype("timedelta64[D]")})
+    base = base.drop_duplicates(KEYS).reset_index(drop=True)
+    n = cells * days // 20
+    daily = pd.DataFrame({"h3_cell": rng.choice(ids, n),
+                          "dte": day0 + rng.integers(0, days, n).astype("timedelta64[D]"),
+                          "pothole_ct": rng.integers(1, 6, n)})
+    daily = daily.groupby(["h3_cell", "dte"], as_index=False)["pothole_ct"].sum()
+    # ring-1 disk: the cell itself plus six neighbours, some outside the active set
+    ring = np.clip(np.arange(cells)[:, None] + np.array([0, -2, -1, 1, 2, 40, -40]), 0, cells - 1)
+    neighbors = pd.DataFrame({"h3_cell": np.repeat(ids, 7), "nbh_cell": ids[ring].ravel()})
+    return {"base": base, "daily": daily, "neighbors": neighbors}
+
+def benchmark(rows: int, check: int) -> Dict[str, float]:
+    src = synthetic_sources(rows)
+    base = _day_key(src["base"], "asof_day")
+    t0 = time.perf_counter()
+    eng = pothole_windows(base, src["daily"], src["neighbors"])
+    engine_s = time.perf_counter() - t0
+
+    sample = base.sample(min(check, len(base)), random_state=0)
+    t0 = time.perf_counter()
+    ref = reference_windows(sample, src["daily"], src["neighbors"])
+    ref_s = time.perf_counter() - t0
+    got = sample[KEYS].merge(eng, on=KEYS, how="left")
+    cols = ["pothole_7d", "pothole_30d", "nbh_pothole_30d"]
+    mismatches = int((got[cols].to_numpy() != ref[cols].to_numpy()).any(axis=1).sum())
+    return {"rows": len(base), "engine_s": round(engine_s, 3),
+            "engine_rows_per_s": int(len(base) / max(engine_s, 1e-9)),
+            "reference_rows_per_s": int(len(sample) / max(ref_s, 1e-9)),
+            "checked": len(sample), "mismatches": mismatches}
+
+def connect(connection: str | None):
+    from snowflake.snowpark import Session
+    builder = Session.builder
+    if connection:
+        builder = builder.config("connection_name", connection)
+    return builder.getOrCreate()
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--connection", help="connections.toml entry (default connection otherwise)")
+    ap.add_argument("--parity", action="store_true", help="compare against FV_POTHOLE_CELL and time both")
+    ap.add_argument("--out", metavar="TABLE", help="overwrite TABLE (CLF_TRAIN columns) with the features")
+    ap.add_argument("--benchmark", type=int, metavar="ROWS", help="synthetic run against the row-by-row reference")
+    ap.add_argument("--check", type=int, default=2000, help="rows checked against the reference in --benchmark")
+    args = ap.parse_args(argv)
+
+    if args.benchmark:
+        stats = benchmark(args.benchmark, args.check)
+        print(", ".join(f"{k}={v:,}" for k, v in stats.items()))
+        return
+
+    session = connect(args.connection)
+    t0 = time.perf_counter()
+    features = build_features(load_sources(session))
+    stats: Dict[str, float] = {"rows": len(features), "engine_s": round(time.perf_counter() - t0, 3)}
+    if args.parity:
+        t0 = time.perf_counter()
+        view = session.sql(VIEW_SQL).to_pandas()
+        stats["view_s"] = round(time.perf_counter() - t0, 3)
+        stats.update({f"diff_{k.lower()}": v for k, v in compare(features, view).items()})
+    if args.out:
+        session.write_pandas(features, args.out, database="CITYDW", schema="SILVER",
+                             overwrite=True, use_logical_type=True)
+    print(", ".join(f"{k}={v:,}" for k, v in stats.items()))
+
+if __name__ == "__main__":
+    main()
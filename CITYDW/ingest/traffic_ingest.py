@@ -0,0 +1,272 @@
+"""
+BR_TRAFFIC_RAW -> SV_TRAFFIC ingestion.
+
+Streams raw ATR count files in bounded chunks, builds TS from YR/M/D/HH/MM,
+resolves each SEGMENTID's WKT point (NY Long Island state plane, EPSG:2263)
+to lon/lat and an H3 cell once per process, and writes Parquet parts shaped
+like SV_TRAFFIC for a bulk COPY. The H3 resolution is read from the segment
+map (H3_RES_SQL) unless --res is given:
+
+    python traffic_ingest.py raw/*.csv --out parts/ --workers 8 --connection dev
+    python traffic_ingest.py --benchmark 2000000 --workers 4
+
+Then stage the parts and load them with COPY_SQL.
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Tuple
+
+import h3
+import numpy as np
+import pandas as pd
+
+RAW_COLUMNS = ["REQUESTID", "BORO", "YR", "M", "D", "HH", "MM", "VOL",
+               "SEGMENTID", "WKTGEOM", "STREET", "FROMST", "TOST", "DIRECTION"]
+OUT_COLUMNS = ["TS", "VOLUME_VEH", "GEOG", "WKTGEOM", "DIRECTION", "H3_CELL"]
+# one resolution for every traffic cell: TK_REFRESH_TRAFFIC_CUBE places new
+# segments at the resolution already in the segment map, and so does ingest
+# (H3_RES only when the map is still empty)
+H3_RES = 9
+H3_RES_SQL = f"""
+select coalesce(max(h3_get_resolution(h3_cell)), {H3_RES})
+from CITYDW.SILVER.SV_TRAFFIC_SEGMENT_CELL
+"""
+CHUNK_ROWS = 250_000
+
+COPY_SQL = """
+copy into CITYDW.SILVER.SV_TRAFFIC (ts, volume_veh, geog, wktgeom, direction, h3_cell)
+from (
+  select $1:TS::timestamp_ntz, $1:VOLUME_VEH::number, to_geography($1:GEOG::string),
+         $1:WKTGEOM::string, $1:DIRECTION::string, $1:H3_CELL::number
+  from @CITYDW.SILVER.SV_TRAFFIC_STAGE
+)
+file_format = (type = parquet use_logical_type = true);
+"""
+
+# ----------------- state plane (EPSG:2263) -> lon/lat -----------------
+# Lambert conformal conic, 2SP, GRS80; US survey feet. Inverse per Snyder (1987).
+_A = 6378137.0
+_F = 1 / 298.257222101
+_E = math.sqrt(2 * _F - _F * _F)
+_FT = 1200 / 3937
+_PHI1, _PHI2, _PHI0 = (math.radians(v) for v in (41 + 2 / 60, 40 + 40 / 60, 40 + 10 / 60))
+_LAM0 = math.radians(-74.0)
+_FE = 300000.0
+
+def _m(phi: float) -> float:
+    return math.cos(phi) / math.sqrt(1 - (_E * math.sin(phi)) ** 2)
+
+def _t(phi: float) -> float:
+    s = _E * math.sin(phi)
+    return math.tan(math.pi / 4 - phi / 2) / ((1 - s) / (1 + s)) ** (_E / 2)
+
+_N = (math.log(_m(_PHI1)) - math.log(_m(_PHI2))) / (math.log(_t(_PHI1)) - math.log(_t(_PHI2)))
+_AF = _A * _m(_PHI1) / (_N * _t(_PHI1) ** _N)
+_RHO0 = _AF * _t(_PHI0) ** _N
+
+def state_plane_to_lonlat(x_ft: np.ndarray, y_ft: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized EPSG:2263 -> WGS84 degrees (NAD83 ~ WGS84 at street scale)."""
+    x = np.asarray(x_ft, dtype=float) * _FT - _FE
+    y = _RHO0 - np.asarray(y_ft, dtype=float) * _FT
+    rho = np.hypot(x, y)
+    t = (rho / _AF) ** (1 / _N)
+    lam = np.arctan2(x, y) / _N + _LAM0
+    phi = np.pi / 2 - 2 * np.arctan(t)
+    for _ in range(6):
+        s = _E * np.sin(phi)
+        phi = np.pi / 2 - 2 * np.arctan(t * ((1 - s) / (1 + s)) ** (_E / 2))
+    return np.degrees(lam), np.degrees(phi)
+
+def parse_wkt_points(wkt: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """x, y of 'POINT (x y)' strings in one regex pass; NaN where unparseable."""
+    xy = wkt.str.extract(r"POINT\s*\(\s*([-+\d.eE]+)\s+([-+\d.eE]+)", expand=True)
+    return (pd.to_numeric(xy[0], errors="coerce").to_numpy(float),
+            pd.to_numeric(xy[1], errors="coerce").to_numpy(float))
+
+# ----------------- segment cache -----------------
+_latlng_to_cell = getattr(h3, "latlng_to_cell", None) or h3.geo_to_h3
+_cell_to_int = getattr(h3, "str_to_int", None) or h3.string_to_h3
+
+# SEGMENTID -> (lon, lat, h3); one per worker process, kept across chunks.
+# Only placeable segments are cached, so a segment first seen without usable
+# WKT is retried when it shows up again.
+_SEGMENTS: Dict[int, Tuple[float, float, int]] = {}
+
+def place_points(wkt: pd.Series, res: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    lon, lat, h3 (-1 if unplaceable) parsed from each row's own WKT. Parsing and
+    projection are vectorized; h3 has no vectorized API, so latlng_to_cell runs once
+    per distinct parsed point rather than once per row.
+    """
+    codes, distinct = pd.factorize(wkt.reset_index(drop=True))
+    lon, lat = state_plane_to_lonlat(*parse_wkt_points(pd.Series(distinct, dtype="string")))
+    ok = np.isfinite(lon) & np.isfinite(lat)
+    cell = np.full(len(lon), -1, dtype=np.int64)
+    if ok.any():
+        pts, back = np.unique(np.column_stack([lon[ok], lat[ok]]), axis=0, return_inverse=True)
+        cells = np.fromiter((_cell_to_int(_latlng_to_cell(y, x, res)) for x, y in pts), np.int64, len(pts))
+        cell[ok] = cells[back.ravel()]
+    # factorize codes missing values as -1: point them at an unplaceable slot
+    lon, lat, cell = np.r_[lon, np.nan], np.r_[lat, np.nan], np.r_[cell, -1]
+    return lon[codes], lat[codes], cell[codes]
+
+def resolve_segments(seg: np.ndarray, wkt: pd.Series, res: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    lon, lat, h3 (-1 if unplaceable) for each row. seg is float with NaN for a
+    missing SEGMENTID. Rows with an id are placed once per segment, from the
+    first row of that segment with parseable WKT, and hit the cache after that;
+    rows without one are placed from their own WKT and never cached. Both go
+    through a single place_points call per chunk.
+    """
+    n = len(seg)
+    lon, lat = np.full(n, np.nan), np.full(n, np.nan)
+    cell = np.full(n, -1, dtype=np.int64)
+    wkt = wkt.reset_index(drop=True)
+
+    loose = np.flatnonzero(np.isnan(seg) & wkt.notna().to_numpy())
+    keyed = np.flatnonzero(~np.isnan(seg))
+    ids = seg[keyed].astype(np.int64)
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    missing = np.fromiter((int(s) not in _SEGMENTS for s in uniq), bool, len(uniq))
+    cand = np.flatnonzero(missing[inverse] & wkt.iloc[keyed].notna().to_numpy())
+    # first row with WKT for each uncached segment
+    rows = cand[np.unique(ids[cand], return_index=True)[1]] if len(cand) else cand
+
+    if len(loose) or len(rows):
+        p_lon, p_lat, p_cell = place_points(wkt.iloc[np.r_[loose, keyed[rows]]], res)
+        k = len(loose)
+        lon[loose], lat[loose], cell[loose] = p_lon[:k], p_lat[:k], p_cell[:k]
+        for sid, x, y, c in zip(ids[rows], p_lon[k:], p_lat[k:], p_cell[k:]):
+            if c >= 0:
+                _SEGMENTS[int(sid)] = (float(x), float(y), int(c))
+    if not len(keyed):
+        return lon, lat, cell
+    looked = [_SEGMENTS.get(int(s), (np.nan, np.nan, -1)) for s in uniq]
+    lon[keyed] = np.fromiter((v[0] for v in looked), float, len(looked))[inverse]
+    lat[keyed] = np.fromiter((v[1] for v in looked), float, len(looked))[inverse]
+    cell[keyed] = np.fromiter((v[2] for v in looked), np.int64, len(looked))[inverse]
+    return lon, lat, cell
+
+# ----------------- transform -----------------
+def read_raw_chunks(path: str, rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(path, chunksize=rows, dtype={"WKTGEOM": "string", "DIRECTION": "string"})
+    for chunk in reader:
+        chunk.columns = [c.upper() for c in chunk.columns]
+        yield chunk[[c for c in RAW_COLUMNS if c in chunk.columns]]
+
+def transform_chunk(raw: pd.DataFrame, res: int = H3_RES) -> pd.DataFrame:
+    """One raw chunk -> SV_TRAFFIC columns (GEOG as WKT in lon/lat, converted by COPY)."""
+    ts = pd.to_datetime(pd.DataFrame({
+        "year": raw["YR"], "month": raw["M"], "day": raw["D"],
+        "hour": raw["HH"], "minute": raw["MM"],
+    }), errors="coerce")
+    seg = pd.to_numeric(raw["SEGMENTID"], errors="coerce").to_numpy(float)
+    lon, lat, cell = resolve_segments(seg, raw["WKTGEOM"].astype("string"), res)
+    ok = np.isfinite(lon) & np.isfinite(lat)
+    geog = np.full(len(raw), None, dtype=object)
+    geog[ok] = ("POINT(" + pd.Series(lon[ok]).round(7).astype(str) + " "
+                + pd.Series(lat[ok]).round(7).astype(str) + ")").to_numpy()
+    return pd.DataFrame({
+        "TS": ts,
+        "VOLUME_VEH": pd.to_numeric(raw["VOL"], errors="coerce").astype("Int64"),
+        "GEOG": geog,
+        "WKTGEOM": raw["WKTGEOM"].astype("string"),
+        "DIRECTION": raw["DIRECTION"].astype("string"),
+        "H3_CELL": pd.Series(cell, dtype="Int64").mask(cell < 0),
+    })[OUT_COLUMNS]
+
+def write_parquet(df: pd.DataFrame, path: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    # microsecond TS (Snowflake's parquet reader has no nanosecond logical type)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, compression="zstd",
+                   coerce_timestamps="us", allow_truncated_timestamps=True)
+
+def _work(raw: pd.DataFrame, out_path: str | None, res: int) -> Tuple[int, float]:
+    t0 = time.perf_counter()
+    out = transform_chunk(raw, res)
+    if out_path:
+        write_parquet(out, out_path)
+    return len(out), time.perf_counter() - t0
+
+# ----------------- driver -----------------
+def ingest(chunks: Iterator[pd.DataFrame], out_dir: str | None, workers: int = os.cpu_count() or 1,
+           res: int = H3_RES) -> Dict[str, float]:
+    """
+    Fan chunks across a process pool, at most 2 x workers in flight so memory stays
+    bounded by chunk size, one Parquet part per chunk.
+    """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    rows, busy, t0 = 0, 0.0, time.perf_counter()
+    running = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, raw in enumerate(chunks):
+            if len(running) >= 2 * workers:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    n, secs = fut.result()
+                    rows, busy = rows + n, busy + secs
+            part = os.path.join(out_dir, f"sv_traffic_{i:05d}.parquet") if out_dir else None
+            running.add(pool.submit(_work, raw, part, res))
+        for fut in running:
+            n, secs = fut.result()
+            rows, busy = rows + n, busy + secs
+    wall = time.perf_counter() - t0
+    return {"rows": rows, "workers": workers, "wall_s": round(wall, 3),
+            "rows_per_s": int(rows / max(wall, 1e-9)),
+            "rows_per_s_per_core": int(rows / max(wall, 1e-9) / workers),
+            "transform_rows_per_s_per_core": int(rows / max(busy, 1e-9))}
+
+def synthetic_chunks(rows: int, chunk_rows: int = CHUNK_ROWS, segments: int = 5000,
+                     seed: int = 0) -> Iterator[pd.DataFrame]:
+    """Raw-shaped chunks over a fixed set of segments, like a citywide ATR extract."""
+    rng = np.random.default_rng(seed)
+    seg_x = rng.uniform(913_000, 1_067_000, segments)
+    seg_y = rng.uniform(121_000, 272_000, segments)
+    seg_wkt = np.array([f"POINT ({x:.4f} {y:.4f})" for x, y in zip(seg_x, seg_y)], dtype=object)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        s = rng.integers(0, segments, n)
+        yield pd.DataFrame({
+            "REQUESTID": rng.integers(1, 40_000, n), "BORO": rng.choice(["Bronx", "Brooklyn", "Manhattan", "Queens", "Staten Island"], n),
+            "YR": rng.integers(2021, 2026, n), "M": rng.integers(1, 13, n), "D": rng.integers(1, 29, n),
+            "HH": rng.integers(0, 24, n), "MM": rng.choice([0, 15, 30, 45], n), "VOL": rng.integers(0, 400, n),
+            "SEGMENTID": s + 100_000, "WKTGEOM": pd.array(seg_wkt[s], dtype="string"),
+            "STREET": "", "FROMST": "", "TOST": "", "DIRECTION": pd.array(rng.choice(["NB", "SB", "EB", "WB"], n), dtype="string"),
+        })
+
+def warehouse_h3_res(connection: str | None) -> int:
+    from snowflake.snowpark import Session
+    builder = Session.builder
+    if connection:
+        builder = builder.config("connection_name", connection)
+    return int(builder.getOrCreate().sql(H3_RES_SQL).collect()[0][0])
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("paths", nargs="*", help="raw BR_TRAFFIC_RAW CSV files")
+    ap.add_argument("--out", help="directory for Parquet parts")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--res", type=int, help=f"H3 resolution (default: the segment map's; {H3_RES} for --benchmark)")
+    ap.add_argument("--connection", help="connections.toml entry used to read the resolution")
+    ap.add_argument("--benchmark", type=int, metavar="ROWS", help="run on synthetic rows instead of files")
+    args = ap.parse_args(argv)
+
+    if args.benchmark:
+        stats = ingest(synthetic_chunks(args.benchmark, args.chunk_rows), args.out, args.workers, args.res or H3_RES)
+    else:
+        res = args.res or warehouse_h3_res(args.connection)
+        chunks = (c for p in args.paths for c in read_raw_chunks(p, args.chunk_rows))
+        stats = ingest(chunks, args.out, args.workers, res)
+    print(", ".join(f"{k}={v:,}" for k, v in stats.items()))
+    if args.out and not args.benchmark:
+        print(COPY_SQL)
+
+if __name__ == "__main__":
+    main()
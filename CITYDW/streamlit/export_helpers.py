@@ -0,0 +1,179 @@
+"""
+Chunked downloads shared by the Streamlit apps.
+
+Upload this file to the same stage directory as the app files that import it.
+"""
+
+import gzip
+import io
+import tempfile
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+import streamlit as st
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_CHUNK_ROWS = 100_000
+# the download button still hands the finished file to the browser in one piece
+EXPORT_MAX_ROWS = 2_000_000
+
+class ExportBatches:
+    """
+    DataFrame chunks plus their column types, known before the first chunk arrives,
+    so a Parquet schema never depends on which values that chunk happened to hold.
+    """
+
+    def __init__(self, chunks: Iterable[pd.DataFrame], arrow_types: Callable[[], Dict[str, Any]]):
+        self.chunks = chunks
+        self.arrow_types = arrow_types
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return iter(self.chunks)
+
+def _frame_arrow_types(df: pd.DataFrame) -> Dict[str, Any]:
+    import pyarrow as pa
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    return {f.name: f.type for f in schema if not pa.types.is_null(f.type)}
+
+def _snowpark_arrow_types(schema, lowercase: bool) -> Dict[str, Any]:
+    """Arrow types for the columns whose pandas form can come out all-null (untyped) in a chunk."""
+    import pyarrow as pa
+    from snowflake.snowpark import types as T
+    out = {}
+    for field in schema.fields:
+        dt = field.datatype
+        if isinstance(dt, T.StringType):
+            typ = pa.string()
+        elif isinstance(dt, T.BooleanType):
+            typ = pa.bool_()
+        elif isinstance(dt, (T.LongType, T.IntegerType, T.ShortType, T.ByteType)) or (
+                isinstance(dt, T.DecimalType) and dt.scale == 0):
+            typ = pa.int64()
+        elif isinstance(dt, (T.DecimalType, T.DoubleType, T.FloatType)):
+            typ = pa.float64()
+        elif isinstance(dt, T.DateType):
+            typ = pa.date32()
+        else:
+            # timestamps arrive as datetime64 even when null; leave the rest to inference
+            continue
+        name = field.name.strip('"')
+        out[name.lower() if lowercase else name] = typ
+    return out
+
+def frame_batches(df: pd.DataFrame, rows: int = EXPORT_CHUNK_ROWS) -> ExportBatches:
+    chunks = (df.iloc[start:start + rows] for start in range(0, len(df), rows))
+    return ExportBatches(chunks, lambda: _frame_arrow_types(df))
+
+def warehouse_batches(session, sql: str, params: List[Any] | None = None,
+                      lowercase: bool = False) -> ExportBatches:
+    """Stream a query result as pandas chunks instead of one to_pandas() frame."""
+    frame = session.sql(sql, params=params)
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        for chunk in frame.to_pandas_batches():
+            if lowercase:
+                chunk.columns = [c.lower() for c in chunk.columns]
+            yield chunk
+
+    return ExportBatches(chunks(), lambda: _snowpark_arrow_types(frame.schema, lowercase))
+
+def _limit_rows(batches: Iterable[pd.DataFrame], max_rows: int | None, cut: List[bool]) -> Iterator[pd.DataFrame]:
+    left = max_rows
+    for chunk in batches:
+        if left is not None:
+            if left <= 0 or len(chunk) > left:
+                cut.append(True)
+                if left > 0:
+                    yield chunk.iloc[:left]
+                break
+            left -= len(chunk)
+        yield chunk
+
+def write_export(batches: Iterable[pd.DataFrame], fmt: str, fh: BinaryIO) -> None:
+    """Write DataFrame chunks to a binary file object as they arrive; only one chunk is held in memory."""
+    if fmt == "Parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        arrow_types = getattr(batches, "arrow_types", None)
+        declared = arrow_types() if arrow_types else {}
+        writer = None
+        try:
+            for chunk in batches:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    schema = pa.schema([pa.field(f.name, declared.get(f.name, f.type)) for f in table.schema])
+                    writer = pq.ParquetWriter(fh, schema, compression="zstd")
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+    raw = gzip.GzipFile(fileobj=fh, mode="wb") if fmt == "CSV (gzip)" else fh
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    header = True
+    for chunk in batches:
+        chunk.to_csv(text, index=False, header=header)
+        header = False
+    text.flush()
+    text.detach()
+    if raw is not fh:
+        raw.close()
+
+def build_export(batches: Iterable[pd.DataFrame], fmt: str,
+                 max_rows: int | None = EXPORT_MAX_ROWS) -> Tuple[BinaryIO, bool]:
+    """
+    The finished file as an open, rewound anonymous temp file (already unlinked, so
+    nothing is left on disk however the session ends), and whether it was cut at
+    max_rows. The file is never read into memory here.
+    """
+    raw = tempfile.TemporaryFile(buffering=0)
+    cut: List[bool] = []
+    try:
+        buffered = io.BufferedWriter(raw)
+        limited = _limit_rows(batches, max_rows, cut)
+        if isinstance(batches, ExportBatches):
+            limited = ExportBatches(limited, batches.arrow_types)
+        write_export(limited, fmt, buffered)
+        buffered.flush()
+        buffered.detach()
+    except BaseException:
+        raw.close()
+        raise
+    raw.seek(0)
+    return raw, any(cut)
+
+def _drop_export(key: str) -> None:
+    ready = st.session_state.pop(f"{key}_file", None)
+    if ready:
+        ready[1].close()
+
+def export_controls(key: str, file_stem: str, scopes: Dict[str, Callable[[], Iterable[pd.DataFrame]]],
+                    token: str = "") -> None:
+    """
+    Scope/format pickers and a Prepare button: the file is only built when asked for,
+    and offered for download while its scope, format and token (e.g. the active
+    filters) still match; a stale file is closed and dropped from the session. The
+    session keeps only the temp file's handle, not its bytes.
+    """
+    c1, c2 = st.columns(2)
+    scope = c1.selectbox("Export", list(scopes), key=f"{key}_scope")
+    fmt = c2.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_fmt")
+    ext, mime = EXPORT_FORMATS[fmt]
+    want = (scope, fmt, token)
+    if st.button("Prepare file", key=f"{key}_prepare"):
+        _drop_export(key)
+        with st.spinner("Building export..."):
+            st.session_state[f"{key}_file"] = (want, *build_export(scopes[scope](), fmt))
+    ready = st.session_state.get(f"{key}_file")
+    if ready and ready[0] != want:
+        _drop_export(key)
+    elif ready:
+        if ready[2]:
+            st.warning(f"Export cut at the first {EXPORT_MAX_ROWS:,} rows; narrow the filters for the rest.")
+        ready[1].seek(0)
+        st.download_button(f"Download {scope.lower()} ({fmt})", ready[1], file_name=f"{file_stem}.{ext}",
+                           mime=mime, key=f"{key}_download")
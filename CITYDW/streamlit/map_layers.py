@@ -0,0 +1,164 @@
+"""
+pydeck layer builders for the pothole app, plus a synthetic benchmark.
+
+The builders are pure pandas/NumPy (no session), so they can be timed away from
+Streamlit and the warehouse:
+
+    python map_layers.py --benchmark 10000 100000 1000000
+"""
+
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+def _nullable(s: pd.Series) -> pd.Series:
+    """Object column with None for missing values (pydeck JSON has no NaN)."""
+    return s.astype(object).where(s.notna(), None)
+
+def rgba_columns(df: pd.DataFrame, color_mode: str, alpha: int) -> pd.DataFrame:
+    """Red→green by probability, or red/grey by actual outcome; one RGBA row per input row."""
+    n = len(df)
+    a = np.full(n, max(10, min(255, int(alpha))), dtype=np.int64)
+    if color_mode == "Outcome (Actual)":
+        actual = pd.to_numeric(df["actual_label"], errors="coerce").to_numpy(dtype=float) if "actual_label" in df.columns else np.full(n, np.nan)
+        missing = np.isnan(actual)
+        pos = ~missing & (actual == 1)
+        r = np.where(missing, 120, np.where(pos, 220, 160))
+        g = np.where(missing, 120, np.where(pos, 50, 160))
+        b = np.where(missing, 120, np.where(pos, 50, 160))
+    else:
+        prob = pd.to_numeric(df["probability"], errors="coerce").to_numpy(dtype=float) if "probability" in df.columns else np.zeros(n)
+        p = np.clip(np.nan_to_num(prob, nan=0.0), 0.0, 1.0)
+        r = np.rint(255 * p).astype(np.int64)
+        g = np.rint(255 * (1 - p)).astype(np.int64)
+        b = np.full(n, 60, dtype=np.int64)
+    return pd.DataFrame({"r": r, "g": g, "b": b, "a": a}, index=df.index)
+
+def tooltip_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """borough / probability / actual_label / h3_cell / asof_date as JSON-safe columns."""
+    out = pd.DataFrame(index=df.index)
+    prob = pd.to_numeric(df["probability"], errors="coerce") if "probability" in df.columns else pd.Series(np.nan, index=df.index)
+    actual = pd.to_numeric(df["actual_label"], errors="coerce") if "actual_label" in df.columns else pd.Series(np.nan, index=df.index)
+    out["borough"] = _nullable(df["borough"].astype(str).where(df["borough"].notna())) if "borough" in df.columns else None
+    out["probability"] = _nullable(prob.astype(float))
+    out["actual_label"] = _nullable(actual.round().astype("Int64"))
+    out["h3_cell"] = _nullable(df["h3_cell"].astype(str).where(df["h3_cell"].notna())) if "h3_cell" in df.columns else None
+    out["asof_date"] = _nullable(df["asof_date"].astype(str).where(df["asof_date"].notna())) if "asof_date" in df.columns else None
+    return out
+
+def to_scatter_frame(df: pd.DataFrame, color_mode: str) -> pd.DataFrame:
+    """Columnar data for ScatterplotLayer (circles); one NumPy pass over the frame."""
+    if df.empty or "lon" not in df.columns or "lat" not in df.columns:
+        return pd.DataFrame(columns=["lon","lat","radius","r","g","b","a"])
+    lon = pd.to_numeric(df["lon"], errors="coerce")
+    lat = pd.to_numeric(df["lat"], errors="coerce")
+    keep = lon.notna() & lat.notna()
+    df = df[keep]
+    prob = pd.to_numeric(df["probability"], errors="coerce").fillna(0.0) if "probability" in df.columns else pd.Series(0.0, index=df.index)
+    out = pd.DataFrame({"lon": lon[keep].astype(float), "lat": lat[keep].astype(float)})
+    # ~60–220 m radius for visibility (approx area)
+    out["radius"] = (60 + prob.to_numpy(dtype=float) * 160).astype(np.int64)
+    out = out.join(rgba_columns(df, color_mode, 180)).join(tooltip_columns(df))
+    return out.reset_index(drop=True)
+
+def ring_from_geojson(gj) -> List[List[float]] | None:
+    try:
+        g = json.loads(gj) if isinstance(gj, str) else gj
+        ring = (g.get("coordinates", [[]])[0]) if g else []
+        ring_list = [[float(pt[0]), float(pt[1])] for pt in ring if isinstance(pt, list) and len(pt) >= 2]
+        return ring_list or None
+    except Exception:
+        return None
+
+def geometry_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Index by H3 cell (as str) with lat, lon and the parsed boundary ring."""
+    out = pd.DataFrame({
+        "lat": pd.to_numeric(df["lat"], errors="coerce").to_numpy(dtype=float),
+        "lon": pd.to_numeric(df["lon"], errors="coerce").to_numpy(dtype=float),
+        "polygon": [ring_from_geojson(g) for g in df["boundary_geojson"]],
+    }, index=pd.Index(df["h3_cell"].astype(str), name="h3_cell"))
+    return out[~out.index.duplicated()]
+
+def to_polygon_frame(df: pd.DataFrame, color_mode: str, hex_alpha: int, top_n: int,
+                     lookup: Callable[[pd.Series], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Columnar data for PolygonLayer; lookup maps h3_cell values to a geometry_frame
+    (the app passes its cached store). Caps to top_n by probability to avoid blanket & perf issues.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["polygon"])
+
+    df2 = df
+    if "probability" in df2.columns:
+        df2 = df2.nlargest(top_n, "probability")
+
+    geom = lookup(df2["h3_cell"])
+    if geom.empty:
+        return pd.DataFrame(columns=["polygon"])
+
+    polygon = df2["h3_cell"].astype(str).map(geom["polygon"])
+    keep = polygon.notna() & df2["h3_cell"].notna()
+    df2 = df2[keep]
+    out = pd.DataFrame({"polygon": polygon[keep]})
+    out = out.join(rgba_columns(df2, color_mode, hex_alpha)).join(tooltip_columns(df2))
+    for c in ("lon", "lat", "n", "prob_mean"):
+        if c in df2.columns:
+            out[c] = _nullable(pd.to_numeric(df2[c], errors="coerce"))
+        elif c in ("lon", "lat"):
+            out[c] = None
+    return out.reset_index(drop=True)
+
+# ----------------- benchmark -----------------
+BOROUGHS = ["BRONX", "BROOKLYN", "MANHATTAN", "QUEENS", "STATEN ISLAND"]
+
+def synthetic_hotspots(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "asof_date": pd.Timestamp("2024-01-01").date(),
+        "h3_cell": rng.integers(6e17, 7e17, n),
+        "borough": rng.choice(BOROUGHS, n),
+        "probability": rng.random(n),
+        "actual_label": rng.integers(0, 2, n),
+        "lat": 40.5 + 0.4 * rng.random(n),
+        "lon": -74.25 + 0.5 * rng.random(n),
+    })
+
+def synthetic_geometry(df: pd.DataFrame) -> pd.DataFrame:
+    """A geometry_frame for the frame's cells: a small hexagon around each centroid."""
+    ang = np.linspace(0, 2 * np.pi, 7)
+    dx, dy = 0.0015 * np.cos(ang), 0.0011 * np.sin(ang)
+    rings = [np.column_stack((x + dx, y + dy)).tolist() for x, y in zip(df["lon"], df["lat"])]
+    out = pd.DataFrame({"lat": df["lat"].to_numpy(float), "lon": df["lon"].to_numpy(float), "polygon": rings},
+                       index=pd.Index(df["h3_cell"].astype(str), name="h3_cell"))
+    return out[~out.index.duplicated()]
+
+def benchmark(sizes: List[int], color_mode: str = "Probability") -> List[Dict[str, float]]:
+    """Seconds and rows/s per builder and size; polygons use a budget equal to the size."""
+    rows = []
+    for n in sizes:
+        synth = synthetic_hotspots(n)
+        geom = synthetic_geometry(synth)
+        lookup = lambda cells: geom.reindex(pd.Index(cells.dropna().astype(str).unique()))
+        for name, build in (("scatter", lambda: to_scatter_frame(synth, color_mode)),
+                            ("polygon", lambda: to_polygon_frame(synth, color_mode, 70, n, lookup))):
+            t0 = time.perf_counter()
+            build()
+            secs = time.perf_counter() - t0
+            rows.append({"layer": name, "hotspots": n, "seconds": round(secs, 3),
+                         "rows_per_s": int(n / max(secs, 1e-9))})
+    return rows
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--benchmark", type=int, nargs="+", metavar="ROWS", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--color-mode", choices=["Probability", "Outcome (Actual)"], default="Probability")
+    args = ap.parse_args(argv)
+    for r in benchmark(args.benchmark, args.color_mode):
+        print(", ".join(f"{k}={v:,}" if not isinstance(v, str) else f"{k}={v}" for k, v in r.items()))
+
+if __name__ == "__main__":
+    main()
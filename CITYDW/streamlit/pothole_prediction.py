@@ -3,9 +3,17 @@
 import streamlit as st
 from snowflake.snowpark.context import get_active_session
 import pandas as pd
+import numpy as np
 import pydeck as pdk
+import time
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any
-import json
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from export_helpers import export_controls, frame_batches, warehouse_batches
+from query_graph import run_query_graph, session_is_thread_safe
+from map_layers import geometry_frame, to_polygon_frame, to_scatter_frame, tooltip_columns
 
 session = get_active_session()
 st.set_page_config(page_title="NYC Pothole Risk", layout="wide")
@@ -16,140 +24,373 @@ def lc(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = [c.lower() for c in df.columns]
     return df
 
-def pyify_number(x):
-    if x is None:
-        return None
-    try:
-        xi = int(x); xf = float(x)
-        return xi if xi == xf else xf
-    except Exception:
-        try:
-            return float(x)
-        except Exception:
-            return None
-
-def color_from_prob_rg(p: float, alpha: int) -> List[int]:
-    p = 0.0 if p is None else max(0.0, min(1.0, float(p)))
-    r = int(round(255 * p))
-    g = int(round(255 * (1 - p)))
-    b = 60
-    a = max(10, min(255, int(alpha)))
-    return [r, g, b, a]
-
-def color_from_outcome(actual, alpha: int) -> List[int]:
-    a = max(10, min(255, int(alpha)))
-    if actual is None:
-        return [120, 120, 120, a]
-    try:
-        return [220, 50, 50, a] if int(actual) == 1 else [160, 160, 160, a]
-    except Exception:
-        return [120, 120, 120, a]
-
-def to_scatter_records(df: pd.DataFrame, color_mode: str) -> List[Dict[str, Any]]:
-    """Pure-Python records for ScatterplotLayer (circles)."""
-    recs: List[Dict[str, Any]] = []
-    for _, row in df.iterrows():
-        lon = pyify_number(row.get("lon"))
-        lat = pyify_number(row.get("lat"))
-        if lon is None or lat is None:
-            continue
-        prob = pyify_number(row.get("probability"))
-        actual = pyify_number(row.get("actual_label"))
-        color = color_from_outcome(actual, 180) if color_mode == "Outcome (Actual)" else color_from_prob_rg(prob, 180)
-        recs.append({
-            "lon": float(lon),
-            "lat": float(lat),
-            "borough": None if pd.isna(row.get("borough")) else str(row.get("borough")),
-            "probability": None if prob is None else float(prob),
-            "actual_label": None if actual is None else int(actual),
-            "h3_cell": None if row.get("h3_cell") is None else str(row.get("h3_cell")),
-            "asof_date": None if row.get("asof_date") is None else str(row.get("asof_date")),
-            # ~60–220 m radius for visibility (approx area)
-            "radius": int(60 + (0.0 if prob is None else float(prob)) * 160),
-            "color": color,
-        })
-    return recs
-
-def fetch_hex_geojson_for_cells(h3_cells: List[str]) -> pd.DataFrame:
-    """Get GeoJSON polygon for each distinct H3 cell via Snowflake H3_CELL_TO_BOUNDARY()."""
+def fetch_cell_geometry(h3_cells: List[str]) -> pd.DataFrame:
+    """Centroid + GeoJSON boundary for cells missing from SV_H3_CELL_GEOMETRY, via H3_CELL_TO_BOUNDARY()."""
     if not h3_cells:
-        return pd.DataFrame(columns=["h3_cell","geomjson"])
+        return pd.DataFrame(columns=["h3_cell","lat","lon","boundary_geojson"])
     uniq = list(dict.fromkeys([c for c in h3_cells if c]))
     values_rows = ", ".join([f"('{c}')" for c in uniq])
     sql = f"""
       with cells(h3_cell) as (
-        select column1 as h3_cell from values {values_rows}
+        select column1::number as h3_cell from values {values_rows}
       )
       select c.h3_cell,
-             st_asgeojson(h3_cell_to_boundary(c.h3_cell)) as geomjson
+             st_y(st_centroid(to_geography(h3_cell_to_boundary(c.h3_cell)))) as lat,
+             st_x(st_centroid(to_geography(h3_cell_to_boundary(c.h3_cell)))) as lon,
+             st_asgeojson(h3_cell_to_boundary(c.h3_cell)) as boundary_geojson
       from cells c
     """
     df = session.sql(sql).to_pandas()
     return lc(df)
 
-def to_polygon_records(df: pd.DataFrame, color_mode: str, hex_alpha: int, top_n: int) -> List[Dict[str, Any]]:
+@st.cache_resource(show_spinner=False)
+def cell_geometry_store() -> Dict[str, Any]:
     """
-    Build polygon records for PolygonLayer using Snowflake boundaries.
-    Caps to top_n by probability to avoid blanket & perf issues.
+    Process-wide H3 geometry, loaded once from CITYDW.SILVER.SV_H3_CELL_GEOMETRY.
+    Shared by every session: "geom" is only ever replaced (never mutated) under the lock,
+    and "absent" remembers cells the warehouse had no geometry for.
     """
-    if df.empty:
-        return []
-
-    df2 = df.copy()
-    if "probability" in df2.columns:
-        df2 = df2.sort_values("probability", ascending=False).head(top_n)
-
-    cells = df2["h3_cell"].dropna().astype(str).unique().tolist()
-    geo = fetch_hex_geojson_for_cells(cells)
-    if geo.empty:
-        return []
-
-    poly_map: Dict[str, List[List[float]]] = {}
-    for _, row in geo.iterrows():
-        cell = str(row.get("h3_cell"))
-        gj = row.get("geomjson")
+    try:
+        df = lc(session.sql("""
+          select h3_cell, lat, lon, boundary_geojson
+          from CITYDW.SILVER.SV_H3_CELL_GEOMETRY
+        """).to_pandas())
+    except Exception:
+        df = pd.DataFrame(columns=["h3_cell","lat","lon","boundary_geojson"])
+    return {"geom": geometry_frame(df), "absent": frozenset(), "lock": threading.Lock()}
+
+def lookup_cell_geometry(h3_cells: pd.Series) -> pd.DataFrame:
+    """lat / lon / polygon per distinct cell; only cells never looked up before hit Snowflake."""
+    store = cell_geometry_store()
+    keys = pd.Index(h3_cells.dropna().astype(str).unique())
+    geom, absent = store["geom"], store["absent"]
+    missing = keys.difference(geom.index)
+    missing = missing[~missing.isin(list(absent))] if absent else missing
+    if len(missing):
         try:
-            g = json.loads(gj) if isinstance(gj, str) else gj
-            ring = (g.get("coordinates", [[]])[0]) if g else []
-            ring_list = []
-            for pt in ring:
-                if isinstance(pt, list) and len(pt) >= 2:
-                    ring_list.append([float(pt[0]), float(pt[1])])
-            if ring_list:
-                poly_map[cell] = ring_list
+            extra = geometry_frame(fetch_cell_geometry(missing.tolist()))
         except Exception:
-            continue
-
-    recs: List[Dict[str, Any]] = []
-    for _, row in df2.iterrows():
-        cell = str(row.get("h3_cell"))
-        polygon = poly_map.get(cell)
-        if not polygon:
-            continue
-        prob = pyify_number(row.get("probability"))
-        actual = pyify_number(row.get("actual_label"))
-        fill = color_from_outcome(actual, hex_alpha) if color_mode == "Outcome (Actual)" else color_from_prob_rg(prob, hex_alpha)
-        lon = pyify_number(row.get("lon"))
-        lat = pyify_number(row.get("lat"))
-        recs.append({
-            "polygon": polygon,
-            "fill_color": fill,
-            "line_color": [40,40,40,200],
-            "borough": None if pd.isna(row.get("borough")) else str(row.get("borough")),
-            "probability": None if prob is None else float(prob),
-            "actual_label": None if actual is None else int(actual),
-            "h3_cell": cell,
-            "asof_date": None if row.get("asof_date") is None else str(row.get("asof_date")),
-            "lon": None if lon is None else float(lon),
-            "lat": None if lat is None else float(lat),
-        })
-    return recs
+            extra = geometry_frame(pd.DataFrame(columns=["h3_cell","lat","lon","boundary_geojson"]))
+        with store["lock"]:
+            merged = pd.concat([store["geom"], extra])
+            store["geom"] = merged[~merged.index.duplicated()]
+            store["absent"] = store["absent"] | frozenset(missing.difference(extra.index))
+            geom = store["geom"]
+    return geom.reindex(keys)
+
+def attach_centroids(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "h3_cell" not in df.columns:
+        return df
+    geom = lookup_cell_geometry(df["h3_cell"])
+    keys = df["h3_cell"].astype(str)
+    return df.assign(lat=keys.map(geom["lat"]).to_numpy(), lon=keys.map(geom["lon"]).to_numpy())
+
+# Compact layer transport: st.pydeck_chart always ships deck JSON (no binary
+# attribute buffers), so shrink the JSON instead: one-letter keys, quantized
+# numbers, and colour/radius computed in the browser from the probability.
+COMPACT_TOOLTIP_ROWS = 2000
+COMPACT_FILL = {
+    "Probability": "[255 * p, 255 * (1 - p), 60, 180]",
+    "Outcome (Actual)": "l == 1 ? [220, 50, 50, 180] : (l == 0 ? [160, 160, 160, 180] : [120, 120, 120, 180])",
+}
+
+def compact_scatter_frames(df: pd.DataFrame, color_mode: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (points, labelled): the top COMPACT_TOOLTIP_ROWS points with tooltip fields for
+    a pickable layer, and every other point with only x / y / p (+ l). Each point is
+    in exactly one frame, so none is drawn (and blended) twice.
+    """
+    lon = pd.to_numeric(df["lon"], errors="coerce")
+    lat = pd.to_numeric(df["lat"], errors="coerce")
+    keep = lon.notna() & lat.notna()
+    d = df[keep]
+    prob = pd.to_numeric(d["probability"], errors="coerce").fillna(0.0).clip(0.0, 1.0)
+    # 4 decimals ≈ 10 m, well inside the 60–220 m circle radius
+    pts = pd.DataFrame({"x": lon[keep].round(4), "y": lat[keep].round(4), "p": prob.round(3)})
+    if color_mode == "Outcome (Actual)":
+        pts["l"] = pd.to_numeric(d["actual_label"], errors="coerce").fillna(-1).astype(np.int8)
+    top = pts.loc[prob.nlargest(COMPACT_TOOLTIP_ROWS).index]
+    tips = tooltip_columns(d.loc[top.index])
+    labelled = top.assign(b=tips["borough"], c=tips["h3_cell"], d=tips["asof_date"])
+    return pts.drop(index=top.index).reset_index(drop=True), labelled.reset_index(drop=True)
+
+# H3 index bit layout: 4-bit resolution at bit 52, then fifteen 3-bit digits
+# (digit r at bits 3*(15-r)); digits finer than the resolution are all 7.
+H3_RES_SHIFT = np.uint64(52)
+H3_RES_MASK = np.uint64(0xF) << H3_RES_SHIFT
+
+def h3_ids(cells: pd.Series) -> np.ndarray:
+    if pd.api.types.is_integer_dtype(cells):
+        return cells.to_numpy().astype(np.uint64)
+    return cells.astype(str).to_numpy().astype(np.uint64)
+
+def h3_resolution(ids: np.ndarray) -> np.ndarray:
+    return ((ids & H3_RES_MASK) >> H3_RES_SHIFT).astype(np.int64)
+
+def h3_parent(ids: np.ndarray, res: int) -> np.ndarray:
+    """Parent at `res` for cells at resolution >= res (pure bit arithmetic, no SQL)."""
+    unused = np.uint64((1 << (3 * (15 - res))) - 1)
+    return (ids & ~H3_RES_MASK) | (np.uint64(res) << H3_RES_SHIFT) | unused
+
+def choose_lod(ids: np.ndarray, budget: int) -> int:
+    """Finest resolution whose distinct parent count fits the feature budget."""
+    if len(ids) == 0:
+        return 0
+    for res in range(int(h3_resolution(ids).min()), -1, -1):
+        if len(np.unique(h3_parent(ids, res))) <= budget:
+            return res
+    return 0
+
+def h3_rollup(df: pd.DataFrame, res: int) -> pd.DataFrame:
+    """Roll hotspot rows up to parent cells at `res`: max / mean probability and row count."""
+    d = df[df["h3_cell"].notna()]
+    parent = h3_parent(h3_ids(d["h3_cell"]), res)
+    aggs = {
+        "probability": ("probability", "max"),
+        "prob_mean": ("probability", "mean"),
+        "n": ("probability", "size"),
+    }
+    for c, how in (("actual_label", "max"), ("borough", "first"), ("asof_date", "max"), ("lat", "mean"), ("lon", "mean")):
+        if c in d.columns:
+            aggs[c] = (c, how)
+    out = d.assign(_parent=parent).groupby("_parent", sort=False).agg(**aggs)
+    out.insert(0, "h3_cell", out.index.astype(str))
+    return out.reset_index(drop=True)
+
+def threshold_curves(bins: pd.DataFrame) -> pd.DataFrame:
+    """
+    Precision / recall / FPR / lift at every probability bin.
+    One sort of the bins (descending), then cumulative sums give the counts
+    of predictions at or above each threshold.
+    """
+    g = bins.groupby("prob_bin")[["n", "pos"]].sum().iloc[::-1]
+    if g.empty:
+        return pd.DataFrame(columns=["threshold","precision","recall","fpr","lift","flagged"])
+    pp = np.cumsum(g["n"].to_numpy(dtype=float))
+    tp = np.cumsum(g["pos"].to_numpy(dtype=float))
+    fp = pp - tp
+    pos_total, neg_total = tp[-1], pp[-1] - tp[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = tp / pp
+        recall = tp / pos_total if pos_total else np.full(len(tp), np.nan)
+        fpr = fp / neg_total if neg_total else np.full(len(fp), np.nan)
+        lift = precision / (pos_total / pp[-1]) if pos_total else np.full(len(tp), np.nan)
+    return pd.DataFrame({
+        "threshold": g.index.to_numpy(dtype=float),
+        "precision": precision,
+        "recall": recall,
+        "fpr": fpr,
+        "lift": lift,
+        "flagged": pp.astype(np.int64),
+    })
+
+def roc_auc(curves: pd.DataFrame) -> float:
+    fpr = np.r_[0.0, curves["fpr"].to_numpy(dtype=float)]
+    tpr = np.r_[0.0, curves["recall"].to_numpy(dtype=float)]
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+def show_deck(deck: pdk.Deck) -> str | None:
+    """Render the map; returns the H3 cell of a clicked feature where this Streamlit supports map selection."""
+    try:
+        event = st.pydeck_chart(deck, on_select="rerun", selection_mode="single-object", key="hotspot_map")
+    except TypeError:
+        st.pydeck_chart(deck)
+        return None
+    objects = getattr(getattr(event, "selection", None), "objects", None) or {}
+    for rows in objects.values():
+        for obj in rows:
+            cell = obj.get("h3_cell") or obj.get("c")
+            if cell:
+                return str(cell)
+    return None
+
+def parse_cell_id(text: str) -> int | None:
+    """H3 cells arrive as the NUMBER form (digits) or the usual 15-char hex string."""
+    text = (text or "").strip()
+    try:
+        return int(text) if text.isdigit() else int(text, 16)
+    except ValueError:
+        return None
+
+DRILL_CACHE_CELLS = 512
+DRILL_PREFETCH_CELLS = 50
+
+@st.cache_resource(show_spinner=False)
+def drill_cache() -> Dict[str, Any]:
+    """Process-wide LRU of per-cell prediction histories."""
+    return {"lru": OrderedDict(), "lock": threading.Lock(), "inflight": set()}
+
+def fetch_cell_histories(where_cells_sql: str) -> pd.DataFrame:
+    return lc(session.sql(f"""
+      select asof_day::date as asof_date, h3_cell, probability, actual_label, predicted_label
+      from CITYDW.GOLD.POTHOLE_PREDICTIONS
+      where h3_cell in ({where_cells_sql})
+      order by h3_cell, asof_day
+    """).to_pandas())
+
+def fetch_parent_history(cell: int, res: int) -> pd.DataFrame:
+    """Per-day rollup of the predictions under a coarser (map LOD) cell, over its children at `res`."""
+    return lc(session.sql(f"""
+      select asof_day::date as asof_date, {int(cell)} as h3_cell,
+             max(probability) as probability, avg(probability) as prob_mean,
+             max(actual_label) as actual_label, max(predicted_label) as predicted_label,
+             count(*) as n
+      from CITYDW.GOLD.POTHOLE_PREDICTIONS
+      where h3_cell in (select value::number from table(flatten(input => h3_cell_to_children({int(cell)}, {int(res)}))))
+      group by 1
+      order by 1
+    """).to_pandas())
+
+def remember_histories(cells: List[int], hist: pd.DataFrame) -> None:
+    """Store one frame per requested cell (empty when the cell has no rows), evicting LRU entries."""
+    cache = drill_cache()
+    groups = {int(k): g.reset_index(drop=True) for k, g in hist.groupby("h3_cell")} if not hist.empty else {}
+    with cache["lock"]:
+        for c in cells:
+            cache["lru"][c] = groups.get(c, hist.iloc[0:0])
+            cache["lru"].move_to_end(c)
+        while len(cache["lru"]) > DRILL_CACHE_CELLS:
+            cache["lru"].popitem(last=False)
+
+def cell_history(cell: int, pred_res: int) -> pd.DataFrame:
+    """
+    History for one cell; a miss loads the cell and its ring-1 neighbours in one query.
+    Cells coarser than the predictions (rolled-up map hexes) get their children's history per day.
+    """
+    cache = drill_cache()
+    with cache["lock"]:
+        if cell in cache["lru"]:
+            cache["lru"].move_to_end(cell)
+            return cache["lru"][cell]
+    if int(h3_resolution(np.array([cell], dtype=np.uint64))[0]) < pred_res:
+        hist = fetch_parent_history(cell, pred_res)
+        remember_histories([cell], hist)
+        return hist
+    disk = f"select value::number from table(flatten(input => h3_grid_disk({int(cell)}, 1)))"
+    hist = fetch_cell_histories(disk)
+    cells = [cell] + [int(c) for c in hist["h3_cell"].unique() if int(c) != cell] if not hist.empty else [cell]
+    remember_histories(cells, hist)
+    return cache["lru"].get(cell, hist.iloc[0:0])
+
+def prefetch_histories(cells: List[int]) -> None:
+    """Load uncached histories for the given cells in one background query."""
+    if not session_is_thread_safe():
+        return
+    cache = drill_cache()
+    with cache["lock"]:
+        todo = [c for c in dict.fromkeys(cells) if c not in cache["lru"] and c not in cache["inflight"]]
+        cache["inflight"].update(todo)
+    if not todo:
+        return
+
+    def work():
+        try:
+            remember_histories(todo, fetch_cell_histories(", ".join(str(c) for c in todo)))
+        except Exception:
+            pass
+        finally:
+            with cache["lock"]:
+                cache["inflight"].difference_update(todo)
+
+    thread = threading.Thread(target=work, daemon=True)
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        add_script_run_ctx(thread, ctx)
+    thread.start()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_bounds() -> pd.DataFrame:
+    return session.sql("""
+      select to_date(min(asof_day)) as min_d, to_date(max(asof_day)) as max_d
+      from CITYDW.GOLD.POTHOLE_PREDICTIONS
+    """).to_pandas()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_borough_list() -> List[str]:
+    """Raises when the enriched view is unavailable."""
+    boro_df = lc(session.sql("""
+        select distinct borough
+        from CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED
+        where borough is not null
+        order by borough
+    """).to_pandas())
+    return boro_df["borough"].dropna().tolist()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_overall_metrics() -> pd.DataFrame:
+    return lc(session.sql("select * from CITYDW.GOLD.VW_METRICS_OVERALL").to_pandas())
+
+def default_range(bounds: pd.DataFrame):
+    return pd.to_datetime(bounds.iloc[0]["MIN_D"]).date(), pd.to_datetime(bounds.iloc[0]["MAX_D"]).date()
+
+# each entry holds a full sorted frame for one date range: keep only a few ranges alive
+@st.cache_resource(ttl=900, max_entries=3, show_spinner=False)
+def load_prediction_index(date_from, date_to, enriched: bool) -> Dict[str, Any]:
+    """
+    Predictions for the date range, loaded once and sorted by (day, probability desc).
+    Threshold, top-5%-per-day and borough filters are then answered locally.
+    """
+    src = "CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED" if enriched else "CITYDW.GOLD.POTHOLE_PREDICTIONS"
+    boro = "borough" if enriched else "null as borough"
+    df = lc(session.sql(f"""
+      select asof_day::date as asof_date, h3_cell, {boro}, probability, actual_label
+      from {src}
+      where asof_day::date between ? and ?
+        and probability is not null
+    """, params=[str(date_from), str(date_to)]).to_pandas())
+    day = pd.to_datetime(df["asof_date"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    neg_prob = -pd.to_numeric(df["probability"], errors="coerce").to_numpy(dtype=float)
+    order = np.lexsort((neg_prob, day))
+    frame = df.iloc[order].reset_index(drop=True)
+    boro_codes, boro_names = pd.factorize(frame["borough"])
+    return {
+        "frame": frame,
+        "day": day[order],
+        "neg_prob": neg_prob[order],
+        "boro_code": boro_codes,
+        "boro_names": list(boro_names),
+    }
+
+@st.cache_data(ttl=60, show_spinner=False)
+def prediction_batch_key() -> str:
+    """Changes whenever a prediction batch is appended; keys the curve cache."""
+    k = session.sql("select count(*) as n, max(asof_day) as max_d from CITYDW.GOLD.POTHOLE_PREDICTIONS").to_pandas()
+    return f"{k.iloc[0]['N']}|{k.iloc[0]['MAX_D']}"
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_curve_bins(batch_key: str, enriched: bool, date_from, date_to) -> pd.DataFrame:
+    """
+    Counts per (borough, 0.001 probability bin) over the date range, summed in the
+    warehouse: at most a few thousand rows whatever the range. Bins are floored, so
+    bin b holds probabilities in [b, b + 0.001) and "bins >= t" is exactly "probability >= t".
+    """
+    src = "CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED" if enriched else "CITYDW.GOLD.POTHOLE_PREDICTIONS"
+    boro = "borough" if enriched else "null"
+    return lc(session.sql(f"""
+      select {boro} as borough, floor(probability * 1000) / 1000 as prob_bin,
+             count(*) as n, sum(iff(actual_label=1,1,0)) as pos
+      from {src}
+      where probability is not null
+        and asof_day::date between ? and ?
+      group by 1, 2
+    """, params=[str(date_from), str(date_to)]).to_pandas())
+
+# ----------------- cold start: independent queries in parallel -----------------
+with st.spinner("Loading data..."):
+    run_query_graph({
+        "bounds":   (load_bounds, []),
+        "boroughs": (load_borough_list, []),
+        "metrics":  (load_overall_metrics, []),
+        "geometry": (cell_geometry_store, []),
+        "batch":    (prediction_batch_key, []),
+        # the enriched view is in use exactly when the borough list loads
+        "curves":   (lambda key, b, _: load_curve_bins(key, True, *default_range(b)), ["batch", "bounds", "boroughs"]),
+        # the sidebar's default range is the full bounds
+        "index":    (lambda b, _: load_prediction_index(*default_range(b), True), ["bounds", "boroughs"]),
+    })
 
 # ----------------- bounds / guards -----------------
-bounds = session.sql("""
-  select to_date(min(asof_day)) as min_d, to_date(max(asof_day)) as max_d
-  from CITYDW.GOLD.POTHOLE_PREDICTIONS
-""").to_pandas()
+bounds = load_bounds()
 if bounds.empty or bounds.iloc[0].isnull().any():
     st.warning("No rows found in CITYDW.GOLD.POTHOLE_PREDICTIONS.")
     st.stop()
@@ -163,14 +404,7 @@ date_range = st.sidebar.date_input("Date range", (min_d, max_d), min_value=min_d
 
 # Try enriched view for boroughs
 try:
-    boro_df = session.sql("""
-        select distinct borough
-        from CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED
-        where borough is not null
-        order by borough
-    """).to_pandas()
-    boro_df = lc(boro_df)
-    borough_choices = ["All"] + boro_df["borough"].dropna().tolist()
+    borough_choices = ["All"] + load_borough_list()
     have_enriched = True
 except Exception:
     borough_choices = ["All"]
@@ -183,106 +417,92 @@ if mode == "By threshold":
     threshold = st.sidebar.slider("Probability threshold", 0.0, 1.0, 0.70, 0.01)
 color_mode = st.sidebar.radio("Color by", ["Probability", "Outcome (Actual)"])
 shape_mode = st.sidebar.radio("Geometry", ["Circles (approx area)", "Exact H3 Hexagons (precision)"])
+compact_maps = st.sidebar.checkbox("Compact map payload", value=True,
+                                   help="Send points with short keys and browser-side colours; tooltips on the top-risk points only.")
 hex_alpha = st.sidebar.slider("Hex fill opacity", 20, 180, 70)
-hex_top_n = st.sidebar.slider("Max hexes to draw", 100, 5000, 1000, step=100)
+hex_top_n = st.sidebar.slider("Hex feature budget", 100, 5000, 1000, step=100,
+                              help="Hexagons are rolled up to coarser H3 levels until they fit this budget.")
 
 date_from = pd.to_datetime(date_range[0]).date()
 date_to   = pd.to_datetime(date_range[1]).date()
 
 # ----------------- data builders -----------------
-def fetch_hotspots(mode: str, threshold: float | None, date_from, date_to, borough_filter: str) -> pd.DataFrame:
-    if have_enriched:
-        if mode == "Top 5% per day":
-            sql = f"""
-              with ranked as (
-                select
-                  asof_day::date as asof_date, h3_cell, borough, probability, actual_label,
-                  st_y(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lat,
-                  st_x(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lon,
-                  ntile(20) over (partition by asof_day order by probability desc) as vintile
-                from CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED
-                where asof_day::date between ? and ?
-                {borough_filter}
-              )
-              select * from ranked where vintile = 1
-            """
-            df = session.sql(sql, params=[str(date_from), str(date_to)]).to_pandas()
-        else:
-            sql = f"""
-              select
-                asof_day::date as asof_date, h3_cell, borough, probability, actual_label,
-                st_y(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lat,
-                st_x(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lon
-              from CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED
-              where asof_day::date between ? and ?
-                and probability >= ?
-                {borough_filter}
-            """
-            df = session.sql(sql, params=[str(date_from), str(date_to), float(threshold)]).to_pandas()
+def day_runs(day: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start/end offsets of each day's run in a day-sorted array."""
+    if len(day) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    ends = np.r_[starts[1:], len(day)]
+    return starts, ends
+
+def ranges_to_positions(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenate [start, stop) ranges into one position array without a Python loop."""
+    lens = np.maximum(stops - starts, 0)
+    if lens.sum() == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lens)[:-1]], lens)
+    return np.arange(lens.sum()) + offsets
+
+def fetch_hotspots(index: Dict[str, Any], mode: str, threshold: float | None, boroughs: List[str] | None) -> pd.DataFrame:
+    frame, day, neg_prob = index["frame"], index["day"], index["neg_prob"]
+    pos = np.arange(len(frame))
+    if boroughs:
+        # boolean masking keeps the (day, probability desc) order
+        # code lookup table; the trailing slot absorbs factorize's -1 (null borough)
+        lut = np.zeros(len(index["boro_names"]) + 1, dtype=bool)
+        lut[[i for i, b in enumerate(index["boro_names"]) if b in set(boroughs)]] = True
+        pos = np.flatnonzero(lut[index["boro_code"]])
+    d, q = day[pos], neg_prob[pos]
+    starts, ends = day_runs(d)
+    if mode == "Top 5% per day":
+        # ntile(20) bucket 1 holds ceil(n/20) rows of each day
+        stops = starts + -(-(ends - starts) // 20)
     else:
-        if mode == "Top 5% per day":
-            sql = """
-              with base as (
-                select
-                  asof_day::date as asof_date, h3_cell, probability, actual_label,
-                  st_y(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lat,
-                  st_x(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lon
-                from CITYDW.GOLD.POTHOLE_PREDICTIONS
-                where asof_day::date between ? and ?
-              ),
-              ranked as (
-                select *, ntile(20) over (partition by asof_date order by probability desc) as vintile
-                from base
-              )
-              select asof_date, h3_cell, null as borough, probability, actual_label, lat, lon
-              from ranked where vintile=1
-            """
-            df = session.sql(sql, params=[str(date_from), str(date_to)]).to_pandas()
-        else:
-            sql = """
-              select
-                asof_day::date as asof_date, h3_cell, null as borough, probability, actual_label,
-                st_y(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lat,
-                st_x(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lon
-              from CITYDW.GOLD.POTHOLE_PREDICTIONS
-              where asof_day::date between ? and ?
-                and probability >= ?
-            """
-            df = session.sql(sql, params=[str(date_from), str(date_to), float(threshold)]).to_pandas()
-    return lc(df)
-
-borough_filter_sql = ""
-if have_enriched and sel_boroughs and "All" not in sel_boroughs:
-    within = ", ".join([f"'{b}'" for b in sel_boroughs])
-    borough_filter_sql = f" and borough in ({within}) "
-
-hotspots = fetch_hotspots(mode, threshold, date_from, date_to, borough_filter_sql)
+        # rows with probability >= threshold form a prefix of each day's run
+        stops = np.array([s + np.searchsorted(q[s:e], -float(threshold), side="right")
+                          for s, e in zip(starts, ends)], dtype=np.int64)
+    take = pos[ranges_to_positions(starts, stops)]
+    # centroids come from the local geometry store, not per-row SQL
+    return attach_centroids(frame.iloc[take].reset_index(drop=True))
+
+pred_index = load_prediction_index(date_from, date_to, have_enriched)
+t0 = time.perf_counter()
+hotspots = fetch_hotspots(pred_index, mode, threshold,
+                          sel_boroughs if have_enriched and sel_boroughs and "All" not in sel_boroughs else None)
+st.sidebar.caption(f"{len(hotspots):,} hotspots from {len(pred_index['frame']):,} predictions "
+                   f"in {(time.perf_counter() - t0)*1000:.0f} ms (in-memory index).")
 
 # ----------------- KPIs -----------------
 st.subheader("Overall Model Quality")
 try:
-    overall = lc(session.sql("select * from CITYDW.GOLD.VW_METRICS_OVERALL").to_pandas())
-    overall = overall.iloc[0] if not overall.empty else None
+    overall = load_overall_metrics()
+    # an empty rollup still returns one all-null row
+    overall = overall.iloc[0] if not overall.empty and pd.notnull(overall.iloc[0]["accuracy"]) else None
 except Exception:
     overall = None
 
 if overall is None:
-    allpred = lc(session.sql("select predicted_label, actual_label from CITYDW.GOLD.POTHOLE_PREDICTIONS").to_pandas())
-    if allpred.empty:
+    # same counts pushed down to the warehouse: one row back, not the whole table
+    overall = lc(session.sql("""
+      select
+        avg(iff(predicted_label = actual_label, 1, 0)) as accuracy,
+        sum(iff(predicted_label=1 and actual_label=1,1,0)) as tp,
+        sum(iff(predicted_label=1 and actual_label=0,1,0)) as fp,
+        sum(iff(predicted_label=0 and actual_label=1,1,0)) as fn,
+        sum(iff(predicted_label=0 and actual_label=0,1,0)) as tn
+      from CITYDW.GOLD.POTHOLE_PREDICTIONS
+    """).to_pandas()).iloc[0]
+    if pd.isnull(overall["accuracy"]):
         st.warning("No predictions to compute metrics.")
         st.stop()
-    acc = (allpred["predicted_label"] == allpred["actual_label"]).mean()
-    tp  = int(((allpred["predicted_label"]==1) & (allpred["actual_label"]==1)).sum())
-    fp  = int(((allpred["predicted_label"]==1) & (allpred["actual_label"]==0)).sum())
-    fn  = int(((allpred["predicted_label"]==0) & (allpred["actual_label"]==1)).sum())
-    tn  = int(((allpred["predicted_label"]==0) & (allpred["actual_label"]==0)).sum())
-    prec = tp/(tp+fp) if (tp+fp)>0 else None
-    rec  = tp/(tp+fn) if (tp+fn)>0 else None
-else:
-    acc  = float(overall["accuracy"])
-    tp   = int(overall["tp"]); fp = int(overall["fp"]); fn  = int(overall["fn"]); tn = int(overall["tn"])
-    prec = float(overall["precision"]) if pd.notnull(overall["precision"]) else None
-    rec  = float(overall["recall"])    if pd.notnull(overall["recall"])    else None
+    tp = int(overall["tp"]); fp = int(overall["fp"]); fn = int(overall["fn"]); tn = int(overall["tn"])
+    overall["precision"] = tp/(tp+fp) if (tp+fp)>0 else None
+    overall["recall"]    = tp/(tp+fn) if (tp+fn)>0 else None
+
+acc  = float(overall["accuracy"])
+tp   = int(overall["tp"]); fp = int(overall["fp"]); fn  = int(overall["fn"]); tn = int(overall["tn"])
+prec = float(overall["precision"]) if pd.notnull(overall["precision"]) else None
+rec  = float(overall["recall"])    if pd.notnull(overall["recall"])    else None
 
 k1, k2, k3, k4 = st.columns(4)
 k1.metric("Accuracy", f"{acc*100:.1f}%")
@@ -292,42 +512,72 @@ k4.metric("Records", f"{tp+fp+fn+tn}")
 
 st.divider()
 
+# ----------------- Threshold curves -----------------
+st.subheader("Threshold Curves")
+try:
+    sl = load_curve_bins(prediction_batch_key(), have_enriched, date_from, date_to)
+    if have_enriched and sel_boroughs and "All" not in sel_boroughs:
+        sl = sl[sl["borough"].isin(sel_boroughs)]
+    curves = threshold_curves(sl)
+except Exception as e:
+    curves = pd.DataFrame()
+    st.info(f"Threshold curves unavailable. ({e})")
+
+if not curves.empty:
+    curve_kind = st.radio("Curve", ["Precision / Recall", "ROC", "Lift"], horizontal=True)
+    if curve_kind == "Precision / Recall":
+        st.line_chart(curves.set_index("threshold")[["precision", "recall"]])
+    elif curve_kind == "ROC":
+        st.line_chart(curves, x="fpr", y="recall")
+        st.caption(f"ROC AUC: {roc_auc(curves):.3f}")
+    else:
+        st.line_chart(curves.set_index("threshold")[["lift"]])
+    if threshold is not None:
+        at = curves[curves["threshold"] >= threshold - 1e-9].tail(1)
+        if not at.empty:
+            r = at.iloc[0]
+            st.caption(f"At threshold {threshold:.2f}: precision {r['precision']*100:.1f}%, "
+                       f"recall {r['recall']*100:.1f}%, lift {r['lift']:.2f}×, {int(r['flagged']):,} cells flagged.")
+
+st.divider()
+
 # ----------------- Map -----------------
 st.subheader(f"Hotspot Map — {shape_mode}")
+picked_cell = None
 if hotspots.empty:
     st.info("No hotspot rows for the selected filters. Try widening the date range or lowering the threshold.")
 else:
-    # ensure lon/lat columns; if missing, derive once
-    if "lon" not in hotspots.columns or "lat" not in hotspots.columns:
-        geodf = session.sql("""
-          select h3_cell,
-                 st_y(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lat,
-                 st_x(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lon
-          from (select distinct h3_cell from CITYDW.GOLD.POTHOLE_PREDICTIONS)
-        """).to_pandas()
-        geodf = lc(geodf)
-        hotspots = hotspots.merge(geodf, on="h3_cell", how="left")
-
     try:
         if shape_mode.startswith("Exact H3"):
-            poly_records = to_polygon_records(hotspots, color_mode, hex_alpha, hex_top_n)
-            if len(poly_records) == 0:
+            cell_ids = h3_ids(hotspots["h3_cell"].dropna())
+            base_res = int(h3_resolution(cell_ids).min()) if len(cell_ids) else 0
+            auto_res = choose_lod(np.unique(cell_ids), hex_top_n)
+            # pydeck does not report the viewport back, so refinement is explicit:
+            # narrowing boroughs/dates lets auto pick finer levels, or pick one here
+            lod_res = st.select_slider("Hex resolution (coarse → fine)", options=list(range(max(0, base_res - 4), base_res + 1)),
+                                       value=max(auto_res, max(0, base_res - 4)))
+            t0 = time.perf_counter()
+            rolled = h3_rollup(hotspots, lod_res)
+            poly_df = to_polygon_frame(rolled, color_mode, hex_alpha, hex_top_n, lookup_cell_geometry)
+            build_s = time.perf_counter() - t0
+            if poly_df.empty:
                 st.info("No polygon geometries available for current filters.")
             else:
-                lons = [r["lon"] for r in poly_records if r.get("lon") is not None]
-                lats = [r["lat"] for r in poly_records if r.get("lat") is not None]
-                if not lons or not lats:
-                    lons = [r["polygon"][0][0] for r in poly_records if r.get("polygon")]
-                    lats = [r["polygon"][0][1] for r in poly_records if r.get("polygon")]
-                center_lon = float(sum(lons)/len(lons))
-                center_lat = float(sum(lats)/len(lats))
+                lons = pd.to_numeric(poly_df["lon"], errors="coerce").dropna()
+                lats = pd.to_numeric(poly_df["lat"], errors="coerce").dropna()
+                if lons.empty or lats.empty:
+                    lons = poly_df["polygon"].str[0].str[0]
+                    lats = poly_df["polygon"].str[0].str[1]
+                center_lon = float(lons.mean())
+                center_lat = float(lats.mean())
 
                 poly_layer = pdk.Layer(
                     "PolygonLayer",
-                    data=poly_records,
+                    id="hotspots",
+                    data=poly_df,
                     get_polygon="polygon",
-                    get_fill_color="fill_color",
-                    get_line_color="line_color",
+                    get_fill_color="[r, g, b, a]",
+                    get_line_color=[40, 40, 40, 200],
                     line_width_min_pixels=1,
                     stroked=True,
                     filled=True,
@@ -339,40 +589,60 @@ else:
                 deck = pdk.Deck(
                     layers=[poly_layer],
                     initial_view_state={"longitude": center_lon, "latitude": center_lat, "zoom": 10.0},
-                    tooltip={"html": "<b>{borough}</b><br/>Prob: {probability}<br/>H3: {h3_cell}<br/>{asof_date}",
+                    tooltip={"html": "<b>{borough}</b><br/>Max prob: {probability}<br/>Mean prob: {prob_mean}<br/>"
+                                     "Rows: {n}<br/>H3: {h3_cell}<br/>{asof_date}",
                              "style": {"backgroundColor": "white", "color": "black"}},
                     map_provider="carto",
                     map_style="light"
                 )
-                st.pydeck_chart(deck)
-                st.caption(f"Hexes drawn: {len(poly_records)}. Use 'Hex fill opacity' and 'Max hexes to draw' to control clutter.")
+                picked_cell = show_deck(deck)
+                st.caption(f"Hexes drawn: {len(poly_df)} at H3 resolution {lod_res} (auto: {auto_res}), "
+                           f"covering {len(hotspots):,} hotspot rows (layer built in {build_s*1000:.0f} ms). "
+                           + ("Some hexes were dropped to fit the feature budget; choose a coarser resolution for full coverage."
+                              if len(rolled) > hex_top_n else "Colour shows the max probability inside each hex."))
         else:
-            scat_records = to_scatter_records(hotspots, color_mode)
-            if len(scat_records) == 0:
+            tooltip = {"html": "<b>{borough}</b><br/>Prob: {probability}<br/>H3: {h3_cell}<br/>{asof_date}",
+                       "style": {"backgroundColor": "white", "color": "black"}}
+            t0 = time.perf_counter()
+            if compact_maps:
+                pts, labelled = compact_scatter_frames(hotspots, color_mode)
+                layers = [
+                    pdk.Layer("ScatterplotLayer", data=pts, get_position="[x, y]",
+                              get_radius="60 + p * 160", get_fill_color=COMPACT_FILL[color_mode]),
+                    pdk.Layer("ScatterplotLayer", id="hotspots", data=labelled, get_position="[x, y]",
+                              get_radius="60 + p * 160", get_fill_color=COMPACT_FILL[color_mode],
+                              pickable=True, auto_highlight=True),
+                ]
+                tooltip["html"] = "<b>{b}</b><br/>Prob: {p}<br/>H3: {c}<br/>{d}"
+                n_points = len(pts) + len(labelled)
+                both = pd.concat([pts[["x", "y"]], labelled[["x", "y"]]])
+                center_lon, center_lat = both["x"].mean(), both["y"].mean()
+            else:
+                scat_df = to_scatter_frame(hotspots, color_mode)
+                layers = [
+                    pdk.Layer("ScatterplotLayer", id="hotspots", data=scat_df, get_position="[lon, lat]",
+                              get_radius="radius", get_fill_color="[r, g, b, a]",
+                              pickable=True, auto_highlight=True),
+                ]
+                n_points = len(scat_df)
+                center_lon, center_lat = (scat_df["lon"].mean(), scat_df["lat"].mean()) if n_points else (0.0, 0.0)
+            build_s = time.perf_counter() - t0
+            if n_points == 0:
                 st.info("No mappable hotspot rows (missing coordinates).")
             else:
-                center_lon = sum([r["lon"] for r in scat_records]) / len(scat_records)
-                center_lat = sum([r["lat"] for r in scat_records]) / len(scat_records)
-
-                scatter_layer = pdk.Layer(
-                    "ScatterplotLayer",
-                    data=scat_records,
-                    get_position="[lon, lat]",
-                    get_radius="radius",
-                    get_fill_color="color",
-                    pickable=True,
-                    auto_highlight=True,
-                )
                 deck = pdk.Deck(
-                    layers=[scatter_layer],
+                    layers=layers,
                     initial_view_state={"longitude": float(center_lon), "latitude": float(center_lat), "zoom": 10.0},
-                    tooltip={"html": "<b>{borough}</b><br/>Prob: {probability}<br/>H3: {h3_cell}<br/>{asof_date}",
-                             "style": {"backgroundColor": "white", "color": "black"}},
+                    tooltip=tooltip,
                     map_provider="carto",
                     map_style="light"
                 )
-                st.pydeck_chart(deck)
-                st.caption(f"Points drawn: {len(scat_records)} (circles show approx influence area).")
+                picked_cell = show_deck(deck)
+                caption = (f"Points drawn: {n_points:,} (circles show approx influence area; "
+                           f"layer built in {build_s*1000:.0f} ms, {len(hotspots)/max(build_s, 1e-9):,.0f} rows/s).")
+                if compact_maps:
+                    caption += f" Tooltips on the top {len(labelled):,} points."
+                st.caption(caption)
     except Exception as e:
         st.warning(f"Map renderer had an issue, showing simple map instead. ({e})")
         fallback_df = hotspots.copy()
@@ -384,37 +654,43 @@ else:
 # ----------------- Leaderboard (+ lat/lon + download) -----------------
 st.subheader("Top Risk Cells (with coordinates)")
 if not hotspots.empty:
-    if "lon" not in hotspots.columns or "lat" not in hotspots.columns:
-        geodf = session.sql("""
-          select h3_cell,
-                 st_y(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lat,
-                 st_x(st_centroid(to_geography(h3_cell_to_boundary(h3_cell)))) as lon
-          from (select distinct h3_cell from CITYDW.GOLD.POTHOLE_PREDICTIONS)
-        """).to_pandas()
-        geodf = lc(geodf)
-        hotspots = hotspots.merge(geodf, on="h3_cell", how="left")
-
     view_cols = [c for c in ["asof_date","borough","h3_cell","lat","lon","probability","actual_label"] if c in hotspots.columns]
     top_tbl = hotspots.sort_values("probability", ascending=False).head(200)[view_cols]
     st.dataframe(top_tbl, use_container_width=True)
 
-    csv = top_tbl.to_csv(index=False).encode("utf-8")
-    st.download_button("Download hotspots (CSV)", data=csv, file_name="pothole_hotspots.csv", mime="text/csv")
+    src = "CITYDW.GOLD.VW_POTHOLE_PREDICTIONS_ENRICHED" if have_enriched else "CITYDW.GOLD.POTHOLE_PREDICTIONS"
+    export_controls("hotspot_export", "pothole_hotspots", {
+        "Top risk cells": lambda: frame_batches(top_tbl),
+        "All hotspots": lambda: frame_batches(hotspots[view_cols]),
+        "All predictions in range": lambda: warehouse_batches(session, f"""
+          select *
+          from {src}
+          where asof_day::date between ? and ?
+          order by asof_day, probability desc
+        """, params=[str(date_from), str(date_to)], lowercase=True),
+    }, token=f"{date_from}|{date_to}|{mode}|{threshold}|{sel_boroughs}")
+
+    # planners usually drill into these next: warm their histories in the background
+    prefetch_histories([int(c) for c in top_tbl["h3_cell"].dropna().head(DRILL_PREFETCH_CELLS)])
 
 
 
 # ----------------- Drilldown -----------------
 st.subheader("Drilldown by H3 Cell")
-cell_id = st.text_input("Enter H3 cell ID (optional)")
+if picked_cell and picked_cell != st.session_state.get("_last_picked_cell"):
+    # a click on the map fills the box (set before the widget is created)
+    st.session_state["_last_picked_cell"] = picked_cell
+    st.session_state["drill_cell"] = picked_cell
+cell_id = st.text_input("Enter H3 cell ID (optional) — or click a hex on the map", key="drill_cell")
 if cell_id:
-    cell_hist = lc(session.sql("""
-      select asof_day::date as asof_date, h3_cell, probability, actual_label, predicted_label
-      from CITYDW.GOLD.POTHOLE_PREDICTIONS
-      where h3_cell = ?
-      order by asof_day
-    """, params=[cell_id]).to_pandas())
+    cell_num = parse_cell_id(cell_id)
+    pred_cells = h3_ids(pred_index["frame"]["h3_cell"].dropna().head(10_000))
+    pred_res = int(h3_resolution(pred_cells).max()) if len(pred_cells) else 15
+    cell_hist = cell_history(cell_num, pred_res) if cell_num is not None else pd.DataFrame()
     if cell_hist.empty:
         st.info("No data for that H3 cell.")
     else:
+        if "n" in cell_hist.columns:
+            st.caption("Rolled-up hex: max / mean probability over its child cells each day.")
         st.dataframe(cell_hist.tail(200), use_container_width=True)
         st.line_chart(cell_hist.set_index("asof_date")["probability"])
@@ -0,0 +1,67 @@
+"""
+Concurrent warm-up of cached loaders, shared by the Streamlit apps.
+
+Upload this file to the same stage directory as the app files that import it.
+
+Every loader runs on the app's one Snowpark session. Snowpark sessions accept
+queries from several threads at once from 1.24.0 on; each query gets its own
+cursor. With an older client the graph runs its tasks one at a time instead,
+with the same results and no overlap.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+MIN_THREAD_SAFE_SNOWPARK = (1, 24, 0)
+
+def session_is_thread_safe() -> bool:
+    """True when the installed Snowpark client supports concurrent queries on one session."""
+    try:
+        from snowflake.snowpark.version import VERSION
+    except ImportError:
+        return False
+    return tuple(VERSION[:3]) >= MIN_THREAD_SAFE_SNOWPARK
+
+def run_query_graph(tasks: Dict[str, tuple], max_workers: int = 6) -> Dict[str, Any]:
+    """
+    Warm cached loaders as a dependency graph. tasks maps name -> (fn, [dependency names]);
+    a task is submitted as soon as its dependencies have results and gets them as
+    positional args, so independent queries run concurrently on the Snowpark session.
+    Failures are swallowed here: the page calls the same cached loaders afterwards
+    and handles errors where it always did.
+    """
+    ctx = get_script_run_ctx()
+    results: Dict[str, Any] = {}
+    failed: set = set()
+    pending = dict(tasks)
+    running: Dict[Any, str] = {}
+
+    def call(name: str):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        fn, deps = tasks[name]
+        return fn(*[results[d] for d in deps])
+
+    workers = max_workers if session_is_thread_safe() else 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name, (_, deps) in list(pending.items()):
+                if any(d in failed for d in deps):
+                    failed.add(name)
+                    pending.pop(name)
+                elif all(d in results for d in deps):
+                    running[pool.submit(call, name)] = name
+                    pending.pop(name)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    results[name] = fut.result()
+                except Exception:
+                    failed.add(name)
+    return results
@@ -1,11 +1,18 @@
 
+import io
 import math
+import threading
+import time
 from datetime import datetime, timedelta, date
 
 import numpy as np
 import pandas as pd
 import streamlit as st
 from snowflake.snowpark.context import get_active_session
+
+from export_helpers import export_controls, frame_batches, warehouse_batches
+from query_graph import run_query_graph
+
 def run():
     st.header("test")
 
@@ -37,63 +44,431 @@ def _to_date(x):
         return x.date() if isinstance(x, datetime) else x
     return pd.to_datetime(x).date()
 
-@st.cache_data(ttl=300, show_spinner=False)
+QUEUE_CATEGORIES = {
+    "agencies": "AGENCY_NAME",
+    "boroughs": "BOROUGH",
+    "types": "COMPLAINT_TYPE",
+    "buckets": "PRIORITY_BUCKET",
+}
+
+TABLE_SILVER = "SILVER.SV_SERVICE_REQUEST"
+QUEUE_REFRESH_SECS = 180
+QUEUE_SELECT = """
+        unique_key, agency_name, complaint_type, descriptor, borough,
+        created_ts, status,
+        age_hours, target_hours, raw_target_hours, breach_risk,
+        severity, recent_similar_count,
+        priority_bucket, priority_score, inferred_due_ts,
+        latitude, longitude, h3_cell
+"""
+QUEUE_COLUMNS = [c.strip().upper() for c in QUEUE_SELECT.replace("\n", " ").split(",")]
+QUEUE_ORDER = ["PRIORITY_SCORE", "AGE_HOURS", "UNIQUE_KEY"]
+QUEUE_SNAPSHOT = "@GOLD.SERVICE_REQUEST_QUEUE_STAGE/queue_store.parquet"
+QUEUE_PERSIST_SECS = 900
+QUEUE_REBUILD_SECS = 3600
+# tables the queue view reads besides the silver rows; their tasks rewrite them
+# without touching the requests, so any change there forces a full rebuild
+QUEUE_SOURCES = [
+    ("GOLD", "SERVICE_REQUEST_SLA_TARGET"),
+    ("SILVER", "SV_SEVERITY_SIGNATURE"),
+    ("GOLD", "SERVICE_REQUEST_REPEAT_COUNT"),
+]
+
+BUCKETS = np.array(["P1", "P2", "P3", "P4"])
+
+def queue_ratios(df):
+    """
+    The two ratios the queue view scores with: age over the unfloored SLA target
+    (RAW_TARGET_HOURS, null when the target is 0) for the score term, and age over
+    the floored TARGET_HOURS for the bucket term.
+    """
+    age = pd.to_numeric(df["AGE_HOURS"], errors="coerce").to_numpy(float)
+    raw = pd.to_numeric(df["RAW_TARGET_HOURS"], errors="coerce").to_numpy(float)
+    safe = pd.to_numeric(df["TARGET_HOURS"], errors="coerce").to_numpy(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        breach = np.where(raw != 0, age / raw, np.nan)
+        bucket = age / safe
+    return breach, bucket
+
+def score_queue(breach, bucket, severity, recent, weights=(0.6, 0.3, 0.1), cuts=(0.75, 0.5), p1_severity=5):
+    """
+    The queue view's scoring, vectorized. breach is age / unfloored target (capped
+    at 3 in the score), bucket is age / floored target (the P1-P4 cut-offs); see
+    queue_ratios. Returns (priority_score, bucket code into BUCKETS).
+    """
+    breach = np.nan_to_num(breach, nan=0.0)
+    bucket = np.nan_to_num(bucket, nan=0.0)
+    sev = np.nan_to_num(severity, nan=3.0)
+    w_breach, w_sev, w_recur = weights
+    score = (w_breach * np.minimum(3.0, breach)
+             + w_sev * (sev / 5.0)
+             + w_recur * np.minimum(1.0, np.nan_to_num(recent, nan=0.0) / 5.0))
+    code = np.full(len(bucket), 3, dtype=np.int8)
+    code[bucket > cuts[1]] = 2
+    code[bucket > cuts[0]] = 1
+    code[(bucket >= 1.0) | (sev >= p1_severity)] = 0
+    return score, code
+
+def score_frame(df, weights=(0.6, 0.3, 0.1), cuts=(0.75, 0.5), p1_severity=5):
+    """score_queue over a queue frame's own columns."""
+    breach, bucket = queue_ratios(df)
+    return score_queue(
+        breach, bucket, pd.to_numeric(df["SEVERITY"], errors="coerce").to_numpy(float),
+        pd.to_numeric(df["RECENT_SIMILAR_COUNT"], errors="coerce").to_numpy(float),
+        weights, cuts, p1_severity)
+
+def queue_parity(df):
+    """
+    Check that the default scoring reproduces the view on rows fresh from it: the
+    number of rows whose bucket differs from PRIORITY_BUCKET, and the largest gap
+    to PRIORITY_SCORE (at most 0.0005 when they agree, as the view rounds it).
+    """
+    if df.empty:
+        return 0, 0.0
+    score, code = score_frame(df)
+    current = df["PRIORITY_BUCKET"].astype("string").str.strip().str.upper().to_numpy(dtype=object)
+    mismatched = int((BUCKETS[code] != current).sum())
+    gap = np.abs(score - pd.to_numeric(df["PRIORITY_SCORE"], errors="coerce").to_numpy(float))
+    return mismatched, float(np.nan_to_num(gap, nan=np.inf).max())
+
+def whatif_rescore(df, weights, cuts, p1_severity, top_n=200):
+    """
+    Rescore a loaded queue frame with alternative weights/cut-offs. Returns the new
+    scores and bucket codes, a 4x4 current->new bucket count matrix, and the row
+    positions of the new top_n (partial sort: only the top_n are fully ordered).
+    """
+    score, code = score_frame(df, weights, cuts, p1_severity)
+    current = pd.Categorical(df["PRIORITY_BUCKET"], categories=BUCKETS).codes
+    known = current >= 0
+    moves = np.bincount(current[known] * 4 + code[known], minlength=16).reshape(4, 4)
+    k = min(top_n, len(score))
+    top = np.argpartition(-score, k - 1)[:k] if k else np.array([], dtype=int)
+    top = top[np.argsort(-score[top], kind="stable")]
+    return score, code, moves, top
+
+def build_queue_store(df, watermark, now, sources, built_at):
+    """
+    Pack a queue frame into the store: categorical codes for the filter columns plus
+    one packed bitmap per value, so sidebar filters are bitmap OR (within a column) /
+    AND (across columns) instead of warehouse queries.
+    """
+    for col in ["AGE_HOURS","TARGET_HOURS","RAW_TARGET_HOURS","BREACH_RISK","SEVERITY","RECENT_SIMILAR_COUNT","PRIORITY_SCORE","LATITUDE","LONGITUDE"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in ["DESCRIPTOR", "STATUS"]:
+        df[col] = df[col].astype("category")
+    bitmaps = {}
+    for col in QUEUE_CATEGORIES.values():
+        vals = df[col].astype("string").str.strip()
+        if col == "PRIORITY_BUCKET":
+            vals = vals.str.upper()
+        df[col] = vals.replace("", pd.NA).astype("category")
+        codes = df[col].cat.codes.to_numpy()
+        bitmaps[col] = {str(v): np.packbits(codes == k) for k, v in enumerate(df[col].cat.categories)}
+    created = pd.to_datetime(df["CREATED_TS"]).to_numpy(dtype="datetime64[ns]")
+    return {"frame": df, "bitmaps": bitmaps, "created": created, "n": len(df),
+            "watermark": watermark, "asof": now, "refreshed": time.monotonic(),
+            "sources": sources, "built_at": built_at}
+
+def load_watermark():
+    """
+    Warehouse clock, the latest change stamp in the silver table and the
+    last_altered stamps of QUEUE_SOURCES, read together.
+    """
+    sources = " or ".join(f"(table_schema = '{sch}' and table_name = '{tbl}')" for sch, tbl in QUEUE_SOURCES)
+    row = session.sql(f"""
+      select current_timestamp()::timestamp_ntz as now,
+             max(greatest(created_ts,
+                          coalesce(resolution_action_updated_ts, created_ts),
+                          coalesce(closed_ts, created_ts))) as watermark,
+             (select listagg(table_schema || '.' || table_name || '@' || last_altered, ',')
+                       within group (order by table_schema, table_name)
+              from CITYDW.INFORMATION_SCHEMA.TABLES
+              where {sources}) as sources
+      from {TABLE_SILVER}
+    """).to_pandas().iloc[0]
+    return pd.Timestamp(row["WATERMARK"]), pd.Timestamp(row["NOW"]), str(row["SOURCES"])
+
+def fetch_queue_store(clock=None):
+    """The whole open queue from the view; clock is a load_watermark() result already in hand."""
+    watermark, now, sources = clock or load_watermark()
+    df = session.sql(f"""
+      select {QUEUE_SELECT}
+      from {VIEW_QUEUE}
+      order by priority_score desc, coalesce(age_hours, -1) desc, unique_key
+    """).to_pandas()
+    parity = queue_parity(df)
+    store = build_queue_store(df, watermark, now, sources, now)
+    store["parity"] = parity
+    return store
+
+def save_queue_snapshot(state):
+    """Persist the store's frame with its watermark to the stage, for the next cold process."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(state["frame"], preserve_index=False)
+    meta = {**(table.schema.metadata or {}), b"watermark": str(state["watermark"]).encode(),
+            b"sources": state["sources"].encode(), b"built_at": str(state["built_at"]).encode()}
+    buf = io.BytesIO()
+    pq.write_table(table.replace_schema_metadata(meta), buf, compression="zstd")
+    buf.seek(0)
+    session.file.put_stream(buf, QUEUE_SNAPSHOT, auto_compress=False, overwrite=True)
+
+def load_queue_snapshot():
+    """The last persisted store as refresh_queue_store() input, or None if there is none usable."""
+    import pyarrow.parquet as pq
+    try:
+        table = pq.read_table(session.file.get_stream(QUEUE_SNAPSHOT))
+    except Exception:
+        return None
+    meta = table.schema.metadata or {}
+    if not all(k in meta for k in (b"watermark", b"sources", b"built_at")):
+        return None
+    df = table.to_pandas()
+    if not set(QUEUE_COLUMNS).issubset(df.columns):
+        return None
+    return {"frame": df, "watermark": pd.Timestamp(meta[b"watermark"].decode()),
+            "sources": meta[b"sources"].decode(), "built_at": pd.Timestamp(meta[b"built_at"].decode()),
+            "parity": None}
+
+@st.cache_resource(show_spinner=False)
+def load_queue_store():
+    """
+    The open queue, loaded once per process. A persisted snapshot is only a warm
+    start: refresh_queue_store() merges the delta past its watermark, or rebuilds
+    in full if the snapshot is due a rebuild anyway. After that, queue_store()
+    keeps it current the same way.
+    """
+    state = None
+    snapshot = load_queue_snapshot()
+    if snapshot is not None:
+        try:
+            state = refresh_queue_store(snapshot)
+        except Exception:
+            state = None
+    if state is None:
+        state = fetch_queue_store()
+    return {"lock": threading.Lock(), "state": state, "saved": -math.inf}
+
+def refresh_queue_store(state):
+    """
+    Fetch only the requests created, updated or closed since the watermark; drop the
+    ones no longer open and upsert the rest as the view has them. Rows nobody touched
+    keep their view values (including the stored AGE_HOURS), so the whole store is
+    rebuilt every QUEUE_REBUILD_SECS and whenever a QUEUE_SOURCES table changes.
+    """
+    clock = load_watermark()
+    watermark, now, sources = clock
+    if (pd.isna(state["watermark"]) or sources != state["sources"]
+            or (now - state["built_at"]).total_seconds() >= QUEUE_REBUILD_SECS):
+        return fetch_queue_store(clock)
+    wm = state["watermark"]
+    # >= re-reads rows stamped at the watermark itself, which the upsert makes harmless;
+    # touched keys with no queue row have closed (or left the open set)
+    delta = session.sql(f"""
+      with touched as (
+        select distinct unique_key as touched_key
+        from {TABLE_SILVER}
+        where created_ts >= '{wm}'
+           or resolution_action_updated_ts >= '{wm}'
+           or closed_ts >= '{wm}'
+      )
+      select t.touched_key, q.*
+      from touched t
+      left join (select {QUEUE_SELECT} from {VIEW_QUEUE}) q
+        on q.unique_key = t.touched_key
+    """).to_pandas()
+
+    df = state["frame"]
+    keep = ~df["UNIQUE_KEY"].isin(delta["TOUCHED_KEY"])
+    upserts = (delta[delta["UNIQUE_KEY"].notna()].drop(columns="TOUCHED_KEY")
+                 .astype({"UNIQUE_KEY": df["UNIQUE_KEY"].dtype}))
+    df = pd.concat([df[keep].astype({c: "object" for c in QUEUE_CATEGORIES.values()}), upserts],
+                   ignore_index=True)
+    for col in ["PRIORITY_SCORE", "AGE_HOURS"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.sort_values(QUEUE_ORDER, ascending=[False, False, True], na_position="last", ignore_index=True)
+    if pd.isna(watermark) or watermark < wm:
+        watermark = wm
+    store = build_queue_store(df, watermark, now, sources, state["built_at"])
+    # upserted rows come straight from the view, so they re-check parity
+    store["parity"] = queue_parity(upserts) if len(upserts) else state.get("parity")
+    return store
+
+def queue_store():
+    """The current queue store, refreshed incrementally at most every QUEUE_REFRESH_SECS."""
+    holder = load_queue_store()
+    with holder["lock"]:
+        if time.monotonic() - holder["state"]["refreshed"] >= QUEUE_REFRESH_SECS:
+            try:
+                holder["state"] = refresh_queue_store(holder["state"])
+            except Exception:
+                # keep serving the last good store; the next run retries the delta
+                holder["state"]["refreshed"] = time.monotonic()
+        state = holder["state"]
+        save = time.monotonic() - holder["saved"] >= QUEUE_PERSIST_SECS
+        if save:
+            # claim the upload, then run it outside the lock; a built store's frame is
+            # never modified, so this one stays consistent while refreshes replace it
+            holder["saved"] = time.monotonic()
+    if save:
+        try:
+            save_queue_snapshot(state)
+        except Exception:
+            # a missing stage only costs the next cold process a full load
+            pass
+    return state
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_filter_options():
+    """
+    One small grouped query feeds every sidebar option list and the date bounds,
+    so the sidebar can render before the full queue store is loaded.
+    """
+    sql = f"""
+      select trim(agency_name) as agency_name, trim(borough) as borough,
+             trim(complaint_type) as complaint_type,
+             upper(trim(priority_bucket)) as priority_bucket,
+             min(created_ts) as min_ts, max(created_ts) as max_ts
+      from {VIEW_QUEUE}
+      group by 1, 2, 3, 4
+    """
+    return session.sql(sql).to_pandas()
+
 def load_distinct(col):
-    sql = f"select distinct {col} as v from {VIEW_QUEUE} where {col} is not null order by {col}"
-    df = session.sql(sql).to_pandas()
-    return [str(x).strip() for x in df["V"].tolist() if str(x).strip() != ""]
+    vals = load_filter_options()[col.upper()].dropna().astype(str)
+    return [v for v in vals.unique() if v]
 
-@st.cache_data(ttl=300, show_spinner=False)
 def load_bucket_options():
-    sql = f"select distinct priority_bucket as v from {VIEW_QUEUE} where priority_bucket is not null order by priority_bucket"
-    df = session.sql(sql).to_pandas()
-    vals = [str(x).strip().upper() for x in df["V"].tolist() if str(x).strip() != ""]
-    return sorted(set(vals))
+    return sorted(load_distinct("priority_bucket"))
 
-@st.cache_data(ttl=300, show_spinner=False)
 def load_date_bounds():
-    sql = f"select to_date(min(created_ts)) as min_d, to_date(max(created_ts)) as max_d from {VIEW_QUEUE}"
-    df = session.sql(sql).to_pandas()
-    if df.empty or df.iloc[0].isna().any():
+    opts = load_filter_options()
+    lo, hi = pd.to_datetime(opts["MIN_TS"]).min(), pd.to_datetime(opts["MAX_TS"]).max()
+    if pd.isna(lo) or pd.isna(hi):
         today = datetime.utcnow().date()
         return today, today
-    return _to_date(df.at[0, "MIN_D"]), _to_date(df.at[0, "MAX_D"])
+    return _to_date(lo), _to_date(hi)
 
-@st.cache_data(ttl=180, show_spinner=False)
 def load_queue(filters):
-    where = []
-    if filters["agencies"]:
-        w = sql_in_list("agency_name", filters["agencies"])
-        if w: where.append(w)
-    if filters["boroughs"]:
-        w = sql_in_list("borough", filters["boroughs"])
-        if w: where.append(w)
-    if filters["types"]:
-        w = sql_in_list("complaint_type", filters["types"])
-        if w: where.append(w)
-    if filters["buckets"]:
-        w = sql_in_list("priority_bucket", filters["buckets"])
-        if w: where.append(w)
+    store = queue_store()
+    n = store["n"]
+    acc = None
+    for key, col in QUEUE_CATEGORIES.items():
+        if not filters[key]:
+            continue
+        bms = [store["bitmaps"][col][v] for v in filters[key] if v in store["bitmaps"][col]]
+        within = np.bitwise_or.reduce(bms) if bms else np.zeros((n + 7) // 8, dtype=np.uint8)
+        acc = within if acc is None else (acc & within)
+    mask = np.unpackbits(acc, count=n).view(bool) if acc is not None else np.ones(n, dtype=bool)
+    if not filters.get("ignore_date", False):
+        if filters["created_from"]:
+            mask &= store["created"] >= np.datetime64(filters["created_from"], "ns")
+        if filters["created_to"]:
+            mask &= store["created"] < np.datetime64(filters["created_to"] + timedelta(days=1), "ns")
+    # the store is already in priority order, so a positional take keeps the ranking
+    return store["frame"].iloc[np.flatnonzero(mask)].reset_index(drop=True)
+
+QUEUE_PAGE_SIZE = 200
+QUEUE_PAGE_COLS = [
+    "UNIQUE_KEY","AGENCY_NAME","BOROUGH","COMPLAINT_TYPE","DESCRIPTOR",
+    "PRIORITY_BUCKET","PRIORITY_SCORE","AGE_HOURS","TARGET_HOURS",
+    "BREACH_RISK","SEVERITY","RECENT_SIMILAR_COUNT","CREATED_TS",
+    "INFERRED_DUE_TS","STATUS"
+]
+
+def queue_where_sql(filters):
+    """The sidebar filters as a SQL where clause (same trimming as the queue store)."""
+    clauses = [
+        sql_in_list("trim(agency_name)", filters["agencies"]),
+        sql_in_list("trim(borough)", filters["boroughs"]),
+        sql_in_list("trim(complaint_type)", filters["types"]),
+        sql_in_list("upper(trim(priority_bucket))", filters["buckets"]),
+    ]
     if not filters.get("ignore_date", False):
         if filters["created_from"]:
-            where.append("created_ts >= to_timestamp_ntz('" + filters["created_from"].strftime("%Y-%m-%d") + "')")
+            clauses.append(f"created_ts >= '{filters['created_from']:%Y-%m-%d}'")
         if filters["created_to"]:
-            end_next = filters["created_to"] + timedelta(days=1)
-            where.append("created_ts < to_timestamp_ntz('" + end_next.strftime("%Y-%m-%d") + "')")
+            clauses.append(f"created_ts < '{filters['created_to'] + timedelta(days=1):%Y-%m-%d}'")
+    clauses = [c for c in clauses if c]
+    return ("where " + " and ".join(clauses)) if clauses else ""
+
+SUMMARY_LEVELS = {"borough": "BOROUGH", "agency": "AGENCY_NAME", "type": "COMPLAINT_TYPE"}
+
+@st.cache_data(ttl=180, show_spinner=False)
+def load_queue_summary(where_sql):
+    """
+    KPIs, borough, agency and complaint-type summaries in one pass over the queue:
+    a single grouping-sets query, tagged by level, instead of pandas over raw rows.
+    """
     sql = f"""
+      with q as (
+        select trim(borough) as borough, trim(agency_name) as agency_name,
+               trim(complaint_type) as complaint_type,
+               upper(trim(priority_bucket)) in ('P1','P2') as is_p1p2,
+               breach_risk > 1 as is_overdue,
+               age_hours, target_hours
+        from {VIEW_QUEUE}
+        {where_sql}
+      )
       select
-        unique_key, agency_name, complaint_type, descriptor, borough,
-        created_ts, status,
-        age_hours, target_hours, breach_risk,
-        severity, recent_similar_count,
-        priority_bucket, priority_score, inferred_due_ts,
-        latitude, longitude, h3_cell
+        case when grouping(borough) = 0 then 'borough'
+             when grouping(agency_name) = 0 then 'agency'
+             when grouping(complaint_type) = 0 then 'type'
+             else 'total' end as level,
+        coalesce(borough, agency_name, complaint_type) as name,
+        count(*) as open_count,
+        count_if(is_p1p2) as p1p2,
+        count_if(is_overdue) as overdue,
+        median(age_hours) as median_age_hr,
+        median(target_hours) as median_target_hr
+      from q
+      group by grouping sets ((borough), (agency_name), (complaint_type), ())
+    """
+    df = session.sql(sql).to_pandas()
+    df.columns = [c.lower() for c in df.columns]
+    for col in ["open_count","p1p2","overdue","median_age_hr","median_target_hr"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def summary_level(summary, level):
+    """One level of the summary, named like the column it groups by (null keys dropped)."""
+    out = summary[(summary["level"] == level) & summary["name"].notna()].drop(columns="level")
+    return out.rename(columns={"name": SUMMARY_LEVELS[level]}).reset_index(drop=True)
+
+def queue_page_key(page):
+    """Seek key of the last row of a page: (priority_score, age_hours, unique_key)."""
+    last = page.iloc[-1]
+    age = -1 if pd.isna(last["AGE_HOURS"]) else int(last["AGE_HOURS"])
+    return (float(last["PRIORITY_SCORE"]), age, int(last["UNIQUE_KEY"]))
+
+@st.cache_data(ttl=180, show_spinner=False)
+def load_queue_page(where_sql, after=None, page_size=QUEUE_PAGE_SIZE):
+    """
+    One page of the ranked queue, seeking past the previous page's last key instead
+    of using OFFSET, so every page costs the same no matter how deep it is.
+    """
+    seek = ""
+    if after is not None:
+        score, age, key = after
+        seek = f"""
+          (priority_score < {score}
+           or (priority_score = {score}
+               and (coalesce(age_hours, -1) < {age}
+                    or (coalesce(age_hours, -1) = {age} and unique_key > {key}))))
+        """
+        seek = (" and " if where_sql else "where ") + seek
+    sql = f"""
+      select {", ".join(QUEUE_PAGE_COLS)}
       from {VIEW_QUEUE}
+      {where_sql} {seek}
+      order by priority_score desc, coalesce(age_hours, -1) desc, unique_key
+      limit {int(page_size)}
     """
-    if where:
-        sql += " where " + " and ".join(where)
-    sql += " order by priority_score desc, age_hours desc"
-    return session.sql(sql).to_pandas()
+    df = session.sql(sql).to_pandas()
+    for col in ["PRIORITY_SCORE","AGE_HOURS","TARGET_HOURS","BREACH_RISK","SEVERITY","RECENT_SIMILAR_COUNT"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
 
 @st.cache_data(ttl=300, show_spinner=False)
 def load_trend():
@@ -120,6 +495,13 @@ def load_trend():
 st.title("City Service Request Prioritization")
 st.caption("Improve response time by ranking and routing the right issues first")
 
+# sidebar options and the trend are independent; the full queue store is loaded later
+with st.spinner("Loading filters..."):
+    run_query_graph({
+        "options": (load_filter_options, []),
+        "trend": (load_trend, []),
+    })
+
 agencies  = sorted(load_distinct("agency_name"))
 boroughs  = sorted([b for b in load_distinct("borough") if b.upper() != "UNSPECIFIED"])
 types     = sorted(load_distinct("complaint_type"))
@@ -154,22 +536,25 @@ filters = {
     "ignore_date": ignore_date,
 }
 
-with st.spinner("Loading data..."):
-    df = load_queue(filters)
-
-if df.empty:
+# first paint only needs one aggregate row and one page, whatever the backlog size
+where_sql = queue_where_sql(filters)
+run_query_graph({
+    "summary": (lambda: load_queue_summary(where_sql), []),
+    "page": (lambda: load_queue_page(where_sql), []),
+})
+summary = load_queue_summary(where_sql)
+kpis = summary[summary["level"] == "total"]
+
+total_open = int(kpis["open_count"].iloc[0]) if not kpis.empty else 0
+if total_open == 0:
     st.warning("No data found. Try clearing filters or expanding date range.")
     st.stop()
 
-for col in ["AGE_HOURS","TARGET_HOURS","BREACH_RISK","SEVERITY","RECENT_SIMILAR_COUNT","PRIORITY_SCORE"]:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-total_open = len(df)
-p1p2 = int((df["PRIORITY_BUCKET"].isin(["P1","P2"])).sum()) if "PRIORITY_BUCKET" in df.columns else 0
-overdue = int((df["BREACH_RISK"] > 1).sum()) if "BREACH_RISK" in df.columns else 0
-med_age = float(np.nanmedian(df["AGE_HOURS"])) if "AGE_HOURS" in df.columns else np.nan
-med_target = float(np.nanmedian(df["TARGET_HOURS"])) if "TARGET_HOURS" in df.columns else np.nan
+kpis = kpis.iloc[0]
+p1p2 = int(kpis["p1p2"])
+overdue = int(kpis["overdue"])
+med_age = float(kpis["median_age_hr"]) if pd.notna(kpis["median_age_hr"]) else np.nan
+med_target = float(kpis["median_target_hr"]) if pd.notna(kpis["median_target_hr"]) else np.nan
 
 c1, c2, c3, c4, c5 = st.columns(5)
 c1.metric("Total Open", f"{total_open:,}")
@@ -221,20 +606,8 @@ with tab_citywide:
     st.subheader("Citywide Summary")
 
     # Borough-level metrics
-    have_cols = {"BOROUGH","UNIQUE_KEY","PRIORITY_BUCKET","BREACH_RISK","AGE_HOURS","TARGET_HOURS"}.issubset(df.columns)
-    if have_cols:
-        grp = (
-            df.assign(P1P2=df["PRIORITY_BUCKET"].isin(["P1","P2"]),
-                      OVERDUE=(df["BREACH_RISK"] > 1))
-              .groupby("BOROUGH", as_index=False)
-              .agg(
-                  open_count=("UNIQUE_KEY","count"),
-                  p1p2=("P1P2","sum"),
-                  overdue=("OVERDUE","sum"),
-                  median_age_hr=("AGE_HOURS","median"),
-                  median_target_hr=("TARGET_HOURS","median")
-              )
-        )
+    grp = summary_level(summary, "borough")
+    if not grp.empty:
         grp["p1p2_pct"] = (grp["p1p2"] / grp["open_count"] * 100).round(1).fillna(0)
         grp["overdue_pct"] = (grp["overdue"] / grp["open_count"] * 100).round(1).fillna(0)
         cols = ["BOROUGH","open_count","p1p2","p1p2_pct","overdue","overdue_pct","median_age_hr","median_target_hr"]
@@ -245,13 +618,13 @@ with tab_citywide:
         st.info("Borough metrics unavailable in current data.")
 
     # Top complaint types (overall)
-    if "COMPLAINT_TYPE" in df.columns:
-        top_types = (
-            df.groupby("COMPLAINT_TYPE", as_index=False)
-              .agg(count=("UNIQUE_KEY","count"))
-              .sort_values("count", ascending=False)
-              .head(10)
-        )
+    top_types = (
+        summary_level(summary, "type")
+          .rename(columns={"open_count": "count"})[["COMPLAINT_TYPE","count"]]
+          .sort_values("count", ascending=False)
+          .head(10)
+    )
+    if not top_types.empty:
         st.subheader("Top Complaint Types (Overall)")
         st.dataframe(top_types, use_container_width=True, hide_index=True)
         st.bar_chart(top_types.set_index("COMPLAINT_TYPE"))
@@ -262,15 +635,54 @@ with tab_citywide:
 with tab_queue:
     st.caption("Queue: prioritized list of open requests.")
     st.subheader("Priority Queue")
-    show_cols = [
-        "UNIQUE_KEY","AGENCY_NAME","BOROUGH","COMPLAINT_TYPE","DESCRIPTOR",
-        "PRIORITY_BUCKET","PRIORITY_SCORE","AGE_HOURS","TARGET_HOURS",
-        "BREACH_RISK","SEVERITY","RECENT_SIMILAR_COUNT","CREATED_TS",
-        "INFERRED_DUE_TS","STATUS"
-    ]
-    existing = [c for c in show_cols if c in df.columns]
-    st.dataframe(df[existing], use_container_width=True, hide_index=True)
-    st.download_button("Download CSV", df[existing].to_csv(index=False).encode("utf-8"), "priority_queue.csv")
+    # keep only the seek keys of the pages shown; the pages themselves are cached
+    cursor = st.session_state.setdefault("queue_cursor", {"where": None, "after": [None]})
+    if cursor["where"] != where_sql:
+        cursor.update(where=where_sql, after=[None])
+    pages = [load_queue_page(where_sql, after) for after in cursor["after"]]
+    rows = pd.concat(pages, ignore_index=True)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    st.caption(f"Showing {len(rows):,} of {total_open:,} open requests")
+    if len(pages[-1]) == QUEUE_PAGE_SIZE:
+        if st.button(f"Load next {QUEUE_PAGE_SIZE}", key="queue_more"):
+            cursor["after"].append(queue_page_key(pages[-1]))
+            st.rerun()
+
+# -------- Agency --------
+with tab_agency:
+    st.caption("Agency: P1/P2 counts and top items by agency.")
+    st.subheader("Agency View")
+    grp = summary_level(summary, "agency")[["AGENCY_NAME","open_count","p1p2"]].sort_values("p1p2", ascending=False)
+    if not grp.empty:
+        st.bar_chart(grp.set_index("AGENCY_NAME")[["p1p2"]])
+        sel = st.selectbox("Select Agency", grp["AGENCY_NAME"].unique())
+        # the agency's first queue page, ranked in the warehouse like the Queue tab
+        topN = load_queue_page(queue_where_sql({**filters, "agencies": [sel]}), None, 10)
+        cols = ["UNIQUE_KEY","BOROUGH","COMPLAINT_TYPE","DESCRIPTOR",
+                "PRIORITY_BUCKET","PRIORITY_SCORE","AGE_HOURS","TARGET_HOURS","BREACH_RISK"]
+        existing_cols = [c for c in cols if c in topN.columns]
+        st.dataframe(topN[existing_cols], use_container_width=True, hide_index=True)
+    else:
+        st.info("No agency data found.")
+
+# the full store backs the map and the CSV export; summaries and the queue never wait on it
+t0 = time.perf_counter()
+with st.spinner("Loading open requests..."):
+    df = load_queue(filters)
+store = queue_store()
+st.sidebar.caption(f"{len(df):,} of {store['n']:,} open requests as of {store['asof']:%H:%M} "
+                   f"(filtered locally in {(time.perf_counter() - t0)*1000:.0f} ms)")
+
+with tab_queue:
+    existing = [c for c in QUEUE_PAGE_COLS if c in df.columns]
+    export_controls("queue_export", "priority_queue", {
+        "Filtered queue": lambda: frame_batches(df[existing]),
+        "All open requests": lambda: warehouse_batches(session, f"""
+          select {", ".join(QUEUE_PAGE_COLS)}
+          from {VIEW_QUEUE}
+          order by priority_score desc, coalesce(age_hours, -1) desc, unique_key
+        """),
+    }, token=where_sql)
 
 # -------- Map --------
 with tab_map:
@@ -285,30 +697,6 @@ with tab_map:
     else:
         st.info("Location data not available for map view.")
 
-# -------- Agency --------
-with tab_agency:
-    st.caption("Agency: P1/P2 counts and top items by agency.")
-    st.subheader("Agency View")
-    if "AGENCY_NAME" in df.columns:
-        grp = (
-            df.assign(P1P2=df["PRIORITY_BUCKET"].isin(["P1","P2"]))
-              .groupby("AGENCY_NAME", as_index=False)
-              .agg(open_count=("UNIQUE_KEY","count"), p1p2=("P1P2","sum"))
-              .sort_values("p1p2", ascending=False)
-        )
-        if not grp.empty:
-            st.bar_chart(grp.set_index("AGENCY_NAME")[["p1p2"]])
-            sel = st.selectbox("Select Agency", grp["AGENCY_NAME"].unique())
-            topN = df[df["AGENCY_NAME"] == sel].head(10)
-            cols = ["UNIQUE_KEY","BOROUGH","COMPLAINT_TYPE","DESCRIPTOR",
-                    "PRIORITY_BUCKET","PRIORITY_SCORE","AGE_HOURS","TARGET_HOURS","BREACH_RISK"]
-            existing_cols = [c for c in cols if c in topN.columns]
-            st.dataframe(topN[existing_cols], use_container_width=True, hide_index=True)
-        else:
-            st.info("No agency data found.")
-    else:
-        st.info("Agency information unavailable.")
-
 # -------- Explain --------
 with tab_explain:
     st.caption("Explain: how scores and buckets are built.")
@@ -328,4 +716,40 @@ with tab_explain:
 All scores and updates are computed in Snowflake; this app provides a live operational view.
     """)
 
+    st.subheader("What-if Rescoring")
+    st.caption("Try alternative weights and bucket cut-offs on the loaded queue; nothing is written back.")
+    w1, w2, w3 = st.columns(3)
+    w_breach = w1.slider("Breach risk weight", 0.0, 1.0, 0.6, 0.05)
+    w_sev    = w2.slider("Severity weight", 0.0, 1.0, 0.3, 0.05)
+    w_recur  = w3.slider("Recurrence weight", 0.0, 1.0, 0.1, 0.05)
+    k1, k2, k3 = st.columns(3)
+    cut_p2 = k1.slider("P2 above breach ratio", 0.0, 1.0, 0.75, 0.05)
+    cut_p3 = k2.slider("P3 above breach ratio", 0.0, 1.0, 0.5, 0.05)
+    p1_sev = k3.slider("P1 at severity ≥", 1, 5, 5)
+
+    t0 = time.perf_counter()
+    new_score, new_code, moves, top = whatif_rescore(
+        df, (w_breach, w_sev, w_recur), (cut_p2, cut_p3), p1_sev)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    moved = int(moves.sum() - np.trace(moves))
+    m1, m2 = st.columns(2)
+    m1.metric("Requests changing bucket", f"{moved:,}", f"{pct(moved, len(df)):.1f}%")
+    m2.metric("New P1/P2", f"{int((new_code <= 1).sum()):,}",
+              f"{int((new_code <= 1).sum()) - int(moves[:2].sum()):+,}")
+    st.dataframe(pd.DataFrame(moves, index=[f"now {b}" for b in BUCKETS], columns=[f"→ {b}" for b in BUCKETS]),
+                 use_container_width=True)
+    ranked = df.iloc[top][["UNIQUE_KEY","AGENCY_NAME","COMPLAINT_TYPE","PRIORITY_BUCKET","PRIORITY_SCORE"]].copy()
+    ranked["WHATIF_BUCKET"] = BUCKETS[new_code[top]]
+    ranked["WHATIF_SCORE"] = np.round(new_score[top], 3)
+    st.dataframe(ranked, use_container_width=True, hide_index=True)
+    st.caption(f"Rescored {len(df):,} requests locally in {elapsed_ms:.0f} ms")
+    if store.get("parity"):
+        mismatched, gap = store["parity"]
+        if mismatched or gap > 0.0005 + 1e-9:
+            st.warning(f"Default settings disagree with the queue view on {mismatched:,} bucket(s) "
+                       f"(largest score gap {gap:.4f}) for the rows last loaded from the warehouse.")
+        else:
+            st.caption("Default settings reproduce the queue view's buckets and scores for the rows last loaded from the warehouse.")
+
 st.caption("© Smart City Data Platform – Powered by Snowflake Streamlit")
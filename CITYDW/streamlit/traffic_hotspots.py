@@ -1,8 +1,13 @@
 import streamlit as st
 from snowflake.snowpark.context import get_active_session
 import pandas as pd
+import numpy as np
+import json
+import pydeck as pdk
 import plotly.express as px
 
+from export_helpers import export_controls, frame_batches, warehouse_batches
+
 # ------------------------------
 # App Configuration
 # ------------------------------
@@ -13,11 +18,140 @@ st.set_page_config(
 )
 session = get_active_session()
 
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_sql(sql):
+    return session.sql(sql).to_pandas()
+
+# ------------------------------
+# STREAM_TAB dataset registry
+# ------------------------------
+STREAM_DATASETS = {"rush_hours": 3, "holiday": 5}
+
+@st.cache_data(ttl=300, show_spinner=False)
+def stream_tab_version():
+    """
+    STREAM_TAB's last_altered stamp: a metadata lookup, never a table scan, and the
+    only STREAM_TAB query a widget rerun can trigger. Any load or rewrite moves it.
+    """
+    df = session.sql("""
+        SELECT LAST_ALTERED
+        FROM CITYDW.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = 'SILVER' AND TABLE_NAME = 'STREAM_TAB'
+    """).to_pandas()
+    return str(df.iloc[0, 0]) if len(df) else ""
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_stream_snapshot(load_id, version):
+    """
+    One LOAD_ID, treated as an immutable snapshot: loaded once per process with the
+    text columns as categoricals. version (stream_tab_version()) is part of the key,
+    so a new or rewritten load gets a fresh entry. Callers must not mutate the frame.
+    """
+    df = session.sql("""
+        SELECT BORO, STREET, RUSH_PERIOD, AVG_RUSH_VOLUME
+        FROM CITYDW.SILVER.STREAM_TAB
+        WHERE LOAD_ID = ?
+    """, params=[int(load_id)]).to_pandas()
+    for col in ["BORO", "STREET", "RUSH_PERIOD"]:
+        df[col] = df[col].astype("category")
+    df["AVG_RUSH_VOLUME"] = pd.to_numeric(df["AVG_RUSH_VOLUME"], errors="coerce")
+    return df
+
+RUSH_TOP_K = 5
+
+def ranges_to_positions(starts, stops):
+    """Concatenate [start, stop) ranges into one position array without a Python loop."""
+    lens = np.maximum(stops - starts, 0)
+    if lens.sum() == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lens)[:-1]], lens)
+    return np.arange(lens.sum()) + offsets
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_rush_ranking(load_id, version):
+    """
+    The rush-hour snapshot sorted once by (borough, street, volume desc), with the
+    start/end of every (borough, street) slice and its integer codes. The first
+    RUSH_TOP_K rows of a slice are its top rush periods.
+    """
+    df = load_stream_snapshot(load_id, version)
+    boro = df["BORO"].cat.codes.to_numpy()
+    street = df["STREET"].cat.codes.to_numpy()
+    vol = df["AVG_RUSH_VOLUME"].to_numpy(dtype=float)
+    order = np.lexsort((-vol, street, boro))
+    b, s = boro[order], street[order]
+    starts = np.flatnonzero(np.r_[True, (b[1:] != b[:-1]) | (s[1:] != s[:-1])]) if len(order) else np.zeros(0, dtype=np.int64)
+    rows = df.iloc[order].reset_index(drop=True).rename(columns={"RUSH_PERIOD": "HOUR"})
+    return {
+        "rows": rows,
+        "vol": vol[order],
+        "hour": rows["HOUR"].cat.codes.to_numpy(),
+        "starts": starts,
+        "ends": np.r_[starts[1:], len(order)],
+        "g_boro": b[starts],
+        "g_street": s[starts],
+        "boro_names": list(df["BORO"].cat.categories),
+        "street_names": list(df["STREET"].cat.categories),
+        "hour_names": list(df["RUSH_PERIOD"].cat.categories),
+        "boro_options": df["BORO"].dropna().unique().tolist(),
+        "street_options": df["STREET"].dropna().unique().tolist(),
+    }
+
+def code_lut(names, selected):
+    """Boolean lookup by category code; the trailing slot absorbs the -1 (null) code."""
+    return np.r_[pd.Index(names).isin(selected), False]
+
+def rush_selection(rank, boros, streets):
+    """Positions of the selected slices' rows and of their top RUSH_TOP_K rows."""
+    sel = np.flatnonzero(code_lut(rank["boro_names"], boros)[rank["g_boro"]]
+                         & code_lut(rank["street_names"], streets)[rank["g_street"]])
+    starts, ends = rank["starts"][sel], rank["ends"][sel]
+    return ranges_to_positions(starts, ends), ranges_to_positions(starts, np.minimum(ends, starts + RUSH_TOP_K))
+
+def rush_heatmap(rank, pos):
+    """Mean volume per (borough, hour) over the given rows, via bincount on the codes."""
+    b = rank["rows"]["BORO"].cat.codes.to_numpy()[pos]
+    h = rank["hour"][pos]
+    v = rank["vol"][pos]
+    ok = (b >= 0) & (h >= 0) & ~np.isnan(v)
+    n_h = len(rank["hour_names"])
+    key = b[ok].astype(np.int64) * n_h + h[ok]
+    size = len(rank["boro_names"]) * n_h
+    total = np.bincount(key, weights=v[ok], minlength=size)
+    count = np.bincount(key, minlength=size)
+    cells = np.flatnonzero(count)
+    return pd.DataFrame({
+        "BORO": np.asarray(rank["boro_names"], dtype=object)[cells // n_h],
+        "HOUR": np.asarray(rank["hour_names"], dtype=object)[cells % n_h],
+        "AVG_RUSH_VOLUME": total[cells] / count[cells],
+    })
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_live_hotspots(days, limit):
+    """Largest same-weekday z-scores over the last `days` scored days (kept by TK_REFRESH_TRAFFIC_ANOMALY)."""
+    df = session.sql("""
+        SELECT a.H3_CELL, a.DTE, a.WEEKDAY, a.VOLUME_VEH_DAY, a.BASELINE_MEAN, a.BASELINE_STD,
+               a.BASELINE_N, a.Z_SCORE, g.LAT, g.LON
+        FROM CITYDW.GOLD.TRAFFIC_CELL_ANOMALY a
+        LEFT JOIN CITYDW.SILVER.SV_H3_CELL_GEOMETRY g
+            ON g.H3_CELL = a.H3_CELL
+        WHERE a.DTE > (SELECT DATEADD('day', -?, MAX(DTE)) FROM CITYDW.GOLD.TRAFFIC_CELL_ANOMALY)
+        QUALIFY ROW_NUMBER() OVER (ORDER BY ABS(a.Z_SCORE) DESC) <= ?
+    """, params=[int(days), int(limit)]).to_pandas()
+    df.columns = [c.lower() for c in df.columns]
+    return df
+
+def stream_dataset(name):
+    load_id = STREAM_DATASETS[name]
+    return load_stream_snapshot(load_id, stream_tab_version())
+
 # ------------------------------
 # Header
 # ------------------------------
 st.markdown("<h1 style='text-align:center; color:#0B3D91;'>🚦 NYC Traffic & Pothole Dashboard</h1>", unsafe_allow_html=True)
 st.markdown("<p style='text-align:center; color:#555;'>Monitor traffic, predict potholes, and optimize city services across all NYC boroughs.</p>", unsafe_allow_html=True)
+if st.button("Check for new loads", help="Look for a new STREAM_TAB load now instead of within 5 minutes"):
+    stream_tab_version.clear()
 st.markdown("---")
 
 # ------------------------------
@@ -27,7 +161,8 @@ tabs = st.tabs([
     "📖 Overview", 
     "Top Rush Hours", 
     "Holiday vs Regular Traffic",
-    "Traffic Map"
+    "Traffic Map",
+    "Live hotspots"
 ])
 
 # ------------------------------
@@ -57,23 +192,22 @@ with tabs[1]:
     st.subheader("Top Rush Hours by Borough & Street")
     st.markdown("<p style='color:#555; font-size:14px;'><strong>Rush Hour Definitions:</strong> Morning: 07:00–13:00 | Evening: 14:00–18:00</p>", unsafe_allow_html=True)
 
-    df = session.sql("""
-        SELECT BORO, STREET, RUSH_PERIOD AS HOUR, AVG_RUSH_VOLUME
-        FROM CITYDW.SILVER.STREAM_TAB
-        WHERE LOAD_ID = 3
-    """).to_pandas()
+    load_id = STREAM_DATASETS["rush_hours"]
+    rank = load_rush_ranking(load_id, stream_tab_version())
 
     # Filters
     with st.expander("Filters"):
         select_all_boro = st.checkbox("Select All Boroughs", value=True)
-        selected_boro_list = df['BORO'].unique().tolist() if select_all_boro else st.multiselect("Select Borough(s):", options=df['BORO'].unique())
+        selected_boro_list = rank["boro_options"] if select_all_boro else st.multiselect("Select Borough(s):", options=rank["boro_options"])
         select_all_street = st.checkbox("Select All Streets", value=True)
-        selected_street_list = df['STREET'].unique().tolist() if select_all_street else st.multiselect("Select Street(s):", options=df['STREET'].unique())
+        selected_street_list = rank["street_options"] if select_all_street else st.multiselect("Select Street(s):", options=rank["street_options"])
 
-    filtered_df = df[(df['BORO'].isin(selected_boro_list)) & (df['STREET'].isin(selected_street_list))]
+    # code lookups over the pre-ranked slices: cost follows the selection, not the table
+    rows_pos, top_pos = rush_selection(rank, selected_boro_list, selected_street_list)
+    filtered_df = rank["rows"].iloc[rows_pos]
 
     # Bar Chart
-    top_hours = filtered_df.sort_values(by='AVG_RUSH_VOLUME', ascending=False).groupby(['BORO','STREET']).head(5)
+    top_hours = rank["rows"].iloc[top_pos].sort_values(by='AVG_RUSH_VOLUME', ascending=False)
     bar_chart = px.bar(
         top_hours,
         x='HOUR',
@@ -90,7 +224,7 @@ with tabs[1]:
 
     # Heatmap
     st.subheader("Rush Hour Intensity Heatmap")
-    heatmap_data = filtered_df.groupby(['BORO','HOUR']).AVG_RUSH_VOLUME.mean().reset_index()
+    heatmap_data = rush_heatmap(rank, rows_pos)
     heatmap_data['HOUR'] = heatmap_data['HOUR'].astype(str)
     heatmap_fig = px.density_heatmap(
         heatmap_data,
@@ -115,11 +249,7 @@ with tabs[2]:
     st.subheader("Holiday vs Regular Season Traffic")
 
     # --- Load data ---
-    df3 = session.sql("""
-        SELECT BORO, STREET, RUSH_PERIOD, AVG_RUSH_VOLUME
-        FROM CITYDW.SILVER.STREAM_TAB
-        WHERE LOAD_ID = 5
-    """).to_pandas()
+    df3 = stream_dataset("holiday")
 
     # --- Filters ---
     with st.expander("🔧 Filters", expanded=True):
@@ -150,56 +280,55 @@ with tabs[2]:
     else:
         # Borough-level aggregation if no streets selected
         filtered_df3 = (
-            filtered_df3.groupby(["BORO", "RUSH_PERIOD"], as_index=False)
+            filtered_df3.groupby(["BORO", "RUSH_PERIOD"], as_index=False, observed=True)
             .agg({"AVG_RUSH_VOLUME": "mean"})
         )
         title_suffix = " (Borough-Level Average)"
 
     if filtered_df3.empty:
         st.warning("No data found for the selected filters.")
-        st.stop()
-
-    # --- Plotly line chart (cleaner view) ---
-    fig = px.line(
-        filtered_df3,
-        x="BORO",
-        y="AVG_RUSH_VOLUME",
-        color="RUSH_PERIOD",
-        markers=True,
-        line_dash="RUSH_PERIOD",
-        hover_data=["AVG_RUSH_VOLUME"],
-        title=f"Traffic Pattern: Holiday vs Regular Rush Hours {title_suffix}",
-        labels={
-            "BORO": "Borough",
-            "AVG_RUSH_VOLUME": "Average Traffic Volume",
-            "RUSH_PERIOD": "Traffic Type"
-        },
-    )
+    else:
+        # --- Plotly line chart (cleaner view) ---
+        fig = px.line(
+            filtered_df3,
+            x="BORO",
+            y="AVG_RUSH_VOLUME",
+            color="RUSH_PERIOD",
+            markers=True,
+            line_dash="RUSH_PERIOD",
+            hover_data=["AVG_RUSH_VOLUME"],
+            title=f"Traffic Pattern: Holiday vs Regular Rush Hours {title_suffix}",
+            labels={
+                "BORO": "Borough",
+                "AVG_RUSH_VOLUME": "Average Traffic Volume",
+                "RUSH_PERIOD": "Traffic Type"
+            },
+        )
 
-    fig.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
-    fig.update_layout(
-        template="simple_white",
-        height=500,
-        legend_title_text="Rush Period",
-        yaxis_title="Average Vehicle Volume",
-        xaxis_title="Borough",
-        hovermode="x unified",
-        margin=dict(t=80, b=80)
-    )
+        fig.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
+        fig.update_layout(
+            template="simple_white",
+            height=500,
+            legend_title_text="Rush Period",
+            yaxis_title="Average Vehicle Volume",
+            xaxis_title="Borough",
+            hovermode="x unified",
+            margin=dict(t=80, b=80)
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True)
 
-    # --- Insights Section ---
-    st.markdown("""
-    **Insights:**
-    - Each point represents **average rush-hour traffic** for a borough.
-    - The **lines connect Holiday vs Regular** values, showing relative changes.
-    - Helps you spot where holidays **increase** (or decrease) congestion.
-    """, unsafe_allow_html=True)
+        # --- Insights Section ---
+        st.markdown("""
+        **Insights:**
+        - Each point represents **average rush-hour traffic** for a borough.
+        - The **lines connect Holiday vs Regular** values, showing relative changes.
+        - Helps you spot where holidays **increase** (or decrease) congestion.
+        """, unsafe_allow_html=True)
 
-    # --- Raw Data ---
-    with st.expander("📋 Show Underlying Data"):
-        st.dataframe(filtered_df3, use_container_width=True)
+        # --- Raw Data ---
+        with st.expander("📋 Show Underlying Data"):
+            st.dataframe(filtered_df3, use_container_width=True)
 # ------------------------------
 # -----------------------------
 # 5th Page: Traffic Growth Map
@@ -218,13 +347,15 @@ with tabs[3]:
     # -----------------------------------------------------------
     # 1️⃣ Yearly Aggregated Query (2021–2025)
     # -----------------------------------------------------------
+    # both growth queries read the year x cell rollup of the traffic cube
+    # (kept by TK_REFRESH_TRAFFIC_CUBE), never SV_TRAFFIC itself
     query = """
     WITH yearly_traffic AS (
         SELECT 
-            EXTRACT(YEAR FROM TS) AS traffic_year,
+            traffic_year,
             SUM(VOLUME_VEH) AS total_volume
-        FROM CITYDW.SILVER.SV_TRAFFIC
-        WHERE EXTRACT(YEAR FROM TS) BETWEEN 2021 AND 2025
+        FROM CITYDW.GOLD.TRAFFIC_CUBE_YEAR_CELL
+        WHERE traffic_year BETWEEN 2021 AND 2025
         GROUP BY 1
         ORDER BY 1
     )
@@ -240,89 +371,184 @@ with tabs[3]:
         ) AS pct_change
     FROM yearly_traffic;
     """
-    df_year = session.sql(query).to_pandas()
+    df_year = cached_sql(query)
     
     if df_year.empty:
         st.warning("No traffic data found for 2021–2025.")
-        st.stop()
+    else:
+        # -----------------------------------------------------------
+        # 2️⃣ Map Query (H3 grid aggregation)
+        # -----------------------------------------------------------
+        map_query = """
+        WITH cell_year AS (
+            SELECT
+                traffic_year,
+                H3_CELL,
+                SUM(VOLUME_VEH) AS total_volume
+            FROM CITYDW.GOLD.TRAFFIC_CUBE_YEAR_CELL
+            WHERE traffic_year BETWEEN 2021 AND 2025
+              AND H3_CELL IS NOT NULL
+            GROUP BY 1, H3_CELL
+        )
+        SELECT
+            c.traffic_year,
+            c.H3_CELL,
+            c.total_volume,
+            g.LAT AS lat,
+            g.LON AS lon
+        FROM cell_year c
+        LEFT JOIN CITYDW.SILVER.SV_H3_CELL_GEOMETRY g
+            ON g.H3_CELL = c.H3_CELL
+        ORDER BY 1, c.H3_CELL
+        """
+        df_map = cached_sql(map_query)
+        df_map.columns = [c.lower() for c in df_map.columns]
     
-    # -----------------------------------------------------------
-    # 2️⃣ Map Query (H3 grid aggregation)
-    # -----------------------------------------------------------
-    map_query = """
-    SELECT
-        EXTRACT(YEAR FROM TS) AS traffic_year,
-        H3_CELL,
-        SUM(VOLUME_VEH) AS total_volume,
-        AVG(ST_Y(GEOG)) AS lat,
-        AVG(ST_X(GEOG)) AS lon
-    FROM CITYDW.SILVER.SV_TRAFFIC
-    WHERE EXTRACT(YEAR FROM TS) BETWEEN 2021 AND 2025
-    GROUP BY 1, H3_CELL
-    ORDER BY 1, H3_CELL
-    """
-    df_map = session.sql(map_query).to_pandas()
-    df_map.columns = [c.lower() for c in df_map.columns]
+        # -----------------------------------------------------------
+        # 3️⃣ Year Selector (Multi-select Dropdown)
+        # -----------------------------------------------------------
+        years = sorted(df_year["TRAFFIC_YEAR"].unique())
+        selected_years = st.multiselect(
+            "Select Year(s) for Analysis:",
+            options=years,
+            default=years,
+        )
     
-    # -----------------------------------------------------------
-    # 3️⃣ Year Selector (Multi-select Dropdown)
-    # -----------------------------------------------------------
-    years = sorted(df_year["TRAFFIC_YEAR"].unique())
-    selected_years = st.multiselect(
-        "Select Year(s) for Analysis:",
-        options=years,
-        default=years,
-    )
+        if not selected_years:
+            selected_years = years
     
-    if not selected_years:
-        selected_years = years
+        df_year_filtered = df_year[df_year["TRAFFIC_YEAR"].isin(selected_years)]
+        df_map_filtered = df_map[df_map["traffic_year"].isin(selected_years)]
     
-    df_year_filtered = df_year[df_year["TRAFFIC_YEAR"].isin(selected_years)]
-    df_map_filtered = df_map[df_map["traffic_year"].isin(selected_years)]
+        # -----------------------------------------------------------
+        # 4️⃣ KPIs — Simple Text Summary
+        # -----------------------------------------------------------
+        st.subheader("Summary Statistics")
     
-    # -----------------------------------------------------------
-    # 4️⃣ KPIs — Simple Text Summary
-    # -----------------------------------------------------------
-    st.subheader("Summary Statistics")
+        total_volume = int(df_year_filtered["TOTAL_VOLUME"].sum())
+        avg_growth = df_year_filtered["PCT_CHANGE"].mean(skipna=True)
+        max_growth = df_year_filtered["PCT_CHANGE"].max(skipna=True)
+        min_growth = df_year_filtered["PCT_CHANGE"].min(skipna=True)
     
-    total_volume = int(df_year_filtered["TOTAL_VOLUME"].sum())
-    avg_growth = df_year_filtered["PCT_CHANGE"].mean(skipna=True)
-    max_growth = df_year_filtered["PCT_CHANGE"].max(skipna=True)
-    min_growth = df_year_filtered["PCT_CHANGE"].min(skipna=True)
+        c1, c2, c3, c4 = st.columns(4)
     
-    c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Total Vehicle Volume", f"{total_volume:,}")
+        c2.metric("Average Yearly Growth", f"{avg_growth:.2f}%")
+        c3.metric("Maximum Yearly Growth", f"{max_growth:.2f}%")
+        c4.metric("Minimum Yearly Growth", f"{min_growth:.2f}%")
+        # -----------------------------------------------------------
+        # 5️⃣ Map Section
+        # -----------------------------------------------------------
+        st.subheader("Traffic Volume Map")
     
-    c1.metric("Total Vehicle Volume", f"{total_volume:,}")
-    c2.metric("Average Yearly Growth", f"{avg_growth:.2f}%")
-    c3.metric("Maximum Yearly Growth", f"{max_growth:.2f}%")
-    c4.metric("Minimum Yearly Growth", f"{min_growth:.2f}%")
-    # -----------------------------------------------------------
-    # 5️⃣ Map Section
-    # -----------------------------------------------------------
-    st.subheader("Traffic Volume Map")
+        st.markdown("""
+        **Map Description**  
+        - Each point represents an H3 grid cell with aggregated vehicle volumes.  
+        - Larger circles indicate higher vehicle flow.  
+        - Data shown for selected years.
+        """)
     
-    st.markdown("""
-    **Map Description**  
-    - Each point represents an H3 grid cell with aggregated vehicle volumes.  
-    - Larger clusters indicate higher vehicle flow.  
-    - Data shown for selected years.
-    """)
-    
-    if {"lat", "lon"}.issubset(df_map_filtered.columns) and not df_map_filtered.empty:
-        df_map_plot = df_map_filtered.rename(columns={"lat": "latitude", "lon": "longitude"})
-        st.map(df_map_plot[["latitude", "longitude"]])
-    else:
-        st.info("No coordinates available for map view.")
+        if {"lat", "lon"}.issubset(df_map_filtered.columns) and not df_map_filtered.empty:
+            # one point per cell over the selected years, sent as compact columns:
+            # short keys, ~10 m coordinates, radius precomputed as an integer
+            cells = (
+                df_map_filtered.dropna(subset=["lat", "lon"])
+                .groupby("h3_cell", as_index=False)
+                .agg(lat=("lat", "first"), lon=("lon", "first"), total_volume=("total_volume", "sum"))
+            )
+            vol = pd.to_numeric(cells["total_volume"], errors="coerce").fillna(0).to_numpy(dtype=float)
+            pts = pd.DataFrame({
+                "x": cells["lon"].astype(float).round(4),
+                "y": cells["lat"].astype(float).round(4),
+                "v": vol.astype(np.int64),
+                "r": (50 + 450 * np.sqrt(vol / max(vol.max(), 1.0))).astype(np.int64),
+            })
+            try:
+                deck = pdk.Deck(
+                    layers=[pdk.Layer("ScatterplotLayer", data=pts, get_position="[x, y]", get_radius="r",
+                                      get_fill_color=[11, 61, 145, 140], pickable=True, auto_highlight=True)],
+                    initial_view_state={"longitude": float(pts["x"].mean()), "latitude": float(pts["y"].mean()), "zoom": 10.0},
+                    tooltip={"html": "Vehicles: {v}", "style": {"backgroundColor": "white", "color": "black"}},
+                    map_provider="carto",
+                    map_style="light",
+                )
+                st.pydeck_chart(deck)
+                # same cells either way: full-precision records with long keys vs what is sent
+                full = cells[["lat", "lon", "total_volume"]].head(2000).rename(columns={"lat": "latitude", "lon": "longitude"})
+                scale = len(pts) / max(1, len(full))
+                before = len(json.dumps(full.to_dict(orient="records"), default=str)) * scale
+                after = len(json.dumps(pts.head(2000).to_dict(orient="records"))) * scale
+                st.caption(f"{len(pts):,} cells drawn. Payload ≈ {after/1e3:,.0f} kB vs {before/1e3:,.0f} kB "
+                           f"for the same cells as full-precision records ({before/max(after, 1):.1f}× smaller).")
+            except Exception as e:
+                st.warning(f"Map renderer had an issue, showing simple map instead. ({e})")
+                st.map(pts.rename(columns={"y": "latitude", "x": "longitude"})[["latitude", "longitude"]])
+        else:
+            st.info("No coordinates available for map view.")
     
-    # -----------------------------------------------------------
-    # 6️⃣ Data Download
-    # -----------------------------------------------------------
-    st.subheader("Download Data")
+        # -----------------------------------------------------------
+        # 6️⃣ Data Download
+        # -----------------------------------------------------------
+        st.subheader("Download Data")
     
-    csv = df_year_filtered.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "Download Yearly Growth Data (CSV)",
-        data=csv,
-        file_name="traffic_growth_summary.csv",
-        mime="text/csv",
-    )
+        export_controls("growth_export", "traffic_growth_summary", {
+            "Yearly growth summary": lambda: frame_batches(df_year_filtered),
+            "Cell volumes by year": lambda: warehouse_batches(session, map_query),
+        }, token=str(selected_years))
+
+
+# ------------------------------
+# PAGE 5: Live hotspots
+# ------------------------------
+with tabs[4]:
+    st.subheader("Live Congestion Hotspots")
+    st.markdown("<p style='color:#555; font-size:14px;'>Cells whose daily volume departs most from their own running mean for the same weekday.</p>", unsafe_allow_html=True)
+
+    c1, c2, c3 = st.columns(3)
+    live_days = c1.slider("Recent days", 1, 14, 1)
+    min_z = c2.slider("Minimum |z|", 0.0, 6.0, 2.0, 0.5)
+    direction = c3.radio("Show", ["Surges & drops", "Surges only", "Drops only"], horizontal=True)
+
+    try:
+        live = load_live_hotspots(live_days, 500)
+    except Exception:
+        live = pd.DataFrame()
+
+    if live.empty:
+        st.info("No anomaly scores yet. They appear once the detector has a few weeks of history per cell.")
+    else:
+        z = pd.to_numeric(live["z_score"], errors="coerce")
+        keep = z.abs() >= min_z
+        if direction == "Surges only":
+            keep &= z > 0
+        elif direction == "Drops only":
+            keep &= z < 0
+        live = live[keep].sort_values("z_score", key=lambda s: s.abs(), ascending=False)
+
+        k1, k2, k3 = st.columns(3)
+        k1.metric("Flagged cells", f"{live['h3_cell'].nunique():,}")
+        k2.metric("Surges", f"{int((live['z_score'] > 0).sum()):,}")
+        k3.metric("Drops", f"{int((live['z_score'] < 0).sum()):,}")
+
+        pts = live.dropna(subset=["lat", "lon"])
+        if not pts.empty:
+            zz = pts["z_score"].astype(float).to_numpy()
+            layer_df = pd.DataFrame({
+                "x": pts["lon"].astype(float).round(4),
+                "y": pts["lat"].astype(float).round(4),
+                "z": np.round(zz, 1),
+                "r": (150 + 100 * np.minimum(np.abs(zz), 10)).astype(np.int64),
+                "c": [[215, 48, 39, 170] if v > 0 else [49, 130, 189, 170] for v in zz],
+            })
+            st.pydeck_chart(pdk.Deck(
+                layers=[pdk.Layer("ScatterplotLayer", data=layer_df, get_position="[x, y]", get_radius="r",
+                                  get_fill_color="c", pickable=True, auto_highlight=True)],
+                initial_view_state={"longitude": float(layer_df["x"].mean()), "latitude": float(layer_df["y"].mean()), "zoom": 10.0},
+                tooltip={"html": "z = {z}", "style": {"backgroundColor": "white", "color": "black"}},
+                map_provider="carto",
+                map_style="light",
+            ))
+        st.dataframe(
+            live[["h3_cell", "dte", "volume_veh_day", "baseline_mean", "baseline_std", "baseline_n", "z_score"]].round(2),
+            use_container_width=True, hide_index=True,
+        )